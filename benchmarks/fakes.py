@@ -0,0 +1,193 @@
+import asyncio
+import math
+import random
+import time
+from collections import Counter, deque
+from types import SimpleNamespace
+from gspread.utils import a1_to_rowcol
+from storage import GoogleSheetsStorage
+
+FAKE_REPLY = "Thanks for sharing! Could you tell me a little more about this one?"
+
+
+class LatencyModel:
+    """Lognormal latency around `median` seconds, failing `error_rate` of calls."""
+
+    def __init__(self, median: float, sigma: float = 0.5, error_rate: float = 0.0, seed: int | None = None):
+        self.median = median
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        return self.median * math.exp(self.rng.gauss(0, self.sigma))
+
+    def fails(self) -> bool:
+        return self.rng.random() < self.error_rate
+
+
+class FakeRateLimitError(Exception):
+    """What the API raises when the quota is exceeded (code 429)."""
+
+    code = 429
+
+
+class FakeGenaiClient:
+    """Stand-in for `genai.Client` with simulated latency and errors.
+
+    Implements the two calls AIClient makes, `aio.models.generate_content`
+    and `aio.models.generate_content_stream`. With `rpm_quota`, calls beyond
+    that many in the last minute fail with a 429.
+    """
+
+    def __init__(self, latency: LatencyModel, reply: str = FAKE_REPLY, chunk_size: int = 16, rpm_quota: int = 0):
+        self.latency = latency
+        self.reply = reply
+        self.chunk_size = chunk_size
+        self.rpm_quota = rpm_quota
+        self.calls = Counter()
+        self.aio = SimpleNamespace(models=self)
+        self._recent: deque[float] = deque()
+
+    def _check_quota(self) -> None:
+        if not self.rpm_quota:
+            return
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > 60:
+            self._recent.popleft()
+        if len(self._recent) >= self.rpm_quota:
+            self.calls["rate_limited"] += 1
+            raise FakeRateLimitError("429 RESOURCE_EXHAUSTED: fake quota exceeded")
+        self._recent.append(now)
+
+    async def generate_content(self, model: str, contents: str, config=None) -> SimpleNamespace:
+        self.calls["generate_content"] += 1
+        self._check_quota()
+        await asyncio.sleep(self.latency.sample())
+        if self.latency.fails():
+            self.calls["errors"] += 1
+            raise RuntimeError("Fake model error")
+        return SimpleNamespace(text=self.reply)
+
+    async def generate_content_stream(self, model: str, contents: str, config=None):
+        self.calls["generate_content_stream"] += 1
+        self._check_quota()
+        total = self.latency.sample()
+        fails = self.latency.fails()
+        chunks = [self.reply[i:i + self.chunk_size] for i in range(0, len(self.reply), self.chunk_size)]
+
+        async def stream():
+            # Half the latency to the first chunk, the rest spread over the others
+            await asyncio.sleep(total / 2)
+            for chunk in chunks:
+                if fails:
+                    self.calls["errors"] += 1
+                    raise RuntimeError("Fake model error")
+                yield SimpleNamespace(text=chunk)
+                await asyncio.sleep(total / 2 / len(chunks))
+
+        return stream()
+
+
+class FakeWorksheet:
+    """In-memory stand-in for a gspread Worksheet with simulated latency and errors.
+
+    Covers the calls GoogleSheetsStorage makes. Calls block like gspread's
+    do, so they run on worker threads as in production. Without `questions`
+    the worksheet starts empty (as a new responses tab does).
+    """
+
+    def __init__(self, questions: list[str] | None, latency: LatencyModel, col_count: int = 26):
+        self.latency = latency
+        self.calls = Counter()
+        self.col_count = col_count
+        self.cells: dict[tuple[int, int], str] = {}
+        if questions is not None:
+            self.cells[(1, 1)] = "Question"
+            for row, text in enumerate(questions, start=2):
+                self.cells[(row, 1)] = text
+
+    def _request(self, name: str) -> None:
+        self.calls[name] += 1
+        time.sleep(self.latency.sample())
+        if self.latency.fails():
+            self.calls["errors"] += 1
+            raise ConnectionError(f"Fake Sheets error in {name}")
+
+    def get_all_values(self) -> list[list[str]]:
+        self._request("get_all_values")
+        rows = max(r for r, _ in self.cells)
+        cols = max(c for _, c in self.cells)
+        return [[self.cells.get((r, c), "") for c in range(1, cols + 1)] for r in range(1, rows + 1)]
+
+    def row_values(self, row: int) -> list[str]:
+        self._request("row_values")
+        cols = max((c for r, c in self.cells if r == row), default=0)
+        return [self.cells.get((row, c), "") for c in range(1, cols + 1)]
+
+    def get(self, range_name: str) -> list[list[str]]:
+        """Values of an A1 range, with trailing empty cells and rows trimmed like the API."""
+        self._request("get")
+        first, _, last = range_name.partition(":")
+        row1, col1 = a1_to_rowcol(first)
+        row2, col2 = a1_to_rowcol(last or first)
+        rows = [[self.cells.get((r, c), "") for c in range(col1, col2 + 1)] for r in range(row1, row2 + 1)]
+        for row in rows:
+            while row and not row[-1]:
+                row.pop()
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def col_values(self, col: int) -> list[str]:
+        self._request("col_values")
+        rows = max((r for r, c in self.cells if c == col), default=0)
+        return [self.cells.get((r, col), "") for r in range(1, rows + 1)]
+
+    def add_cols(self, cols: int) -> None:
+        self._request("add_cols")
+        self.col_count += cols
+
+    def append_rows(self, values: list[list[str]], value_input_option: str = "RAW", table_range: str | None = None) -> None:
+        self._request("append_rows")
+        start = max((r for r, _ in self.cells), default=0) + 1
+        for r, row in enumerate(values):
+            for c, value in enumerate(row):
+                self.cells[(start + r, c + 1)] = value
+
+    def batch_update(self, updates: list[dict]) -> None:
+        self._request("batch_update")
+        for update in updates:
+            row, col = a1_to_rowcol(update["range"])
+            for r, values in enumerate(update["values"]):
+                for c, value in enumerate(values):
+                    self.cells[(row + r, col + c)] = value
+
+    @property
+    def saved_columns(self) -> int:
+        """Response columns written so far (column A holds the questions)."""
+        return max((c for r, c in self.cells if r == 1), default=1) - 1
+
+    @property
+    def saved_rows(self) -> int:
+        """Response rows appended so far (row 1 holds the header)."""
+        return max(max((r for r, _ in self.cells), default=1) - 1, 0)
+
+
+class FakeSheetsStorage(GoogleSheetsStorage):
+    """GoogleSheetsStorage writing to FakeWorksheets instead of the API."""
+
+    def __init__(self, worksheet: FakeWorksheet, responses_worksheet: FakeWorksheet | None = None):
+        self._fake_worksheet = worksheet
+        self._fake_responses_worksheet = responses_worksheet
+        super().__init__()
+
+    def _open_responses_worksheet(self) -> FakeWorksheet:
+        return self._fake_responses_worksheet
+
+    def _connect(self) -> None:
+        self.client = SimpleNamespace()
+        self.worksheet = self._fake_worksheet
+        self.stats["connects"] += 1
@@ -0,0 +1,396 @@
+"""End-to-end load generator for the FastAPI app, with fake Gemini and Sheets.
+
+Simulated users run /api/start -> /api/respond ... -> completion in-process
+(httpx ASGI transport) at a target concurrency. The model and the sheet are
+replaced by fakes with configurable latency and error rates, so no network
+or credentials are needed. Usage (from the project root):
+
+    uv run python -m benchmarks.load --concurrency 50 --sessions 500
+    uv run python -m benchmarks.load --stream          # answer through /api/respond/stream like the web client
+    uv run python -m benchmarks.load --ai-latency 1.2 --ai-error-rate 0.02 --sheets-latency 0.4
+    uv run python -m benchmarks.load --sheets-layout rows
+    uv run python -m benchmarks.load --ai-rpm-quota 600 --ai-rpm 550
+    uv run python -m benchmarks.load --sessions 200 --record trace.jsonl
+    uv run python -m benchmarks.load --replay trace.jsonl --speed 10
+
+A trace has one JSON line per session: {"start": <seconds since the run
+started>, "steps": [{"at": <seconds since the session started>, "path":
+"/api/start" | "/api/respond" | "/api/respond/stream", "value": ...}]}.
+
+With --stream, answers go through the server-sent events endpoint the web
+client uses, and the time to the first event is reported as well.
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from benchmarks.fakes import FakeGenaiClient, FakeSheetsStorage, FakeWorksheet, LatencyModel
+from benchmarks.synthetic import invalid_answer, make_questions, valid_answer
+import httpx
+import main
+from config import settings
+from core import CompiledQuestionnaire
+from core.ai_scheduler import AIScheduler
+from models import Question
+from storage import WriteBehindQueue
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of `values`."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class LoadMetrics:
+    """Latency samples per endpoint, errors and event loop lag."""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        # Streaming endpoints: seconds until the first event arrived
+        self.first_event: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.loop_lag: list[float] = []
+        self.sessions_completed = 0
+
+    async def request(self, client: httpx.AsyncClient, path: str, payload: dict | None = None) -> dict | None:
+        """POST to the app and record the latency. Returns the JSON body, or None on errors."""
+        started = time.perf_counter()
+        try:
+            response = await client.post(path, json=payload)
+        except Exception:
+            self.errors[path] += 1
+            return None
+        finally:
+            self.latencies[path].append(time.perf_counter() - started)
+        if response.status_code != 200:
+            self.errors[path] += 1
+            return None
+        return response.json()
+
+    async def stream(self, path: str, payload: dict) -> dict | None:
+        """POST to a server-sent events endpoint, recording the time to the first event.
+
+        The ASGI app is called directly, since httpx's ASGI transport only
+        returns once the whole body is sent. Returns the data of the `final`
+        event, or None on errors.
+        """
+        body = json.dumps(payload).encode("utf-8")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode("ascii"),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"load"), (b"content-type", b"application/json")],
+            "client": ("127.0.0.1", 0),
+            "server": ("load", 80),
+        }
+        request_sent = False
+        finished = asyncio.Event()
+        status = None
+        chunks: list[bytes] = []
+
+        async def receive() -> dict:
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            # Stay connected until the response is complete
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                if chunk and not chunks and status == 200:
+                    self.first_event[path].append(time.perf_counter() - started)
+                chunks.append(chunk)
+                if not message.get("more_body", False):
+                    finished.set()
+
+        started = time.perf_counter()
+        try:
+            await main.app(scope, receive, send)
+        except Exception:
+            self.errors[path] += 1
+            return None
+        finally:
+            finished.set()
+            self.latencies[path].append(time.perf_counter() - started)
+        if status != 200:
+            self.errors[path] += 1
+            return None
+
+        for event in b"".join(chunks).decode("utf-8").split("\n\n"):
+            if event.startswith("event: final\n"):
+                return json.loads(event.split("data: ", 1)[1])
+        self.errors[path] += 1
+        return None
+
+    async def respond(self, client: httpx.AsyncClient, path: str, payload: dict) -> dict | None:
+        """Submit an answer through the plain or the streaming endpoint."""
+        if path.endswith("/stream"):
+            return await self.stream(path, payload)
+        return await self.request(client, path, payload)
+
+    async def monitor_loop_lag(self, interval: float = 0.05) -> None:
+        """Sample how late the event loop wakes up from a sleep."""
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(interval)
+            self.loop_lag.append(max(loop.time() - started - interval, 0))
+
+
+async def simulated_user(
+    client: httpx.AsyncClient,
+    metrics: LoadMetrics,
+    rng: random.Random,
+    invalid_rate: float,
+    think_time: float,
+    trace: list[dict] | None,
+    respond_path: str = "/api/respond"
+) -> None:
+    """Answer a whole questionnaire like a chat user would."""
+    session_started = time.perf_counter()
+    steps = [{"at": 0.0, "path": "/api/start"}]
+    data = await metrics.request(client, "/api/start")
+    if data is None:
+        return
+
+    session_id = data["session_id"]
+    question = data["question"]
+    while question and not data["is_complete"]:
+        if think_time:
+            await asyncio.sleep(rng.uniform(0, 2 * think_time))
+        current = Question(**question)
+        if rng.random() < invalid_rate:
+            value = invalid_answer(current)
+        else:
+            value = valid_answer(current, rng)
+
+        steps.append({"at": time.perf_counter() - session_started, "path": respond_path, "value": value})
+        data = await metrics.respond(client, respond_path, {"session_id": session_id, "value": value})
+        if data is None:
+            return
+        question = data["question"]
+
+    metrics.sessions_completed += 1
+    if trace is not None:
+        trace.append({"start": session_started, "steps": steps})
+
+
+async def replay_session(
+    client: httpx.AsyncClient,
+    metrics: LoadMetrics,
+    steps: list[dict],
+    speed: float,
+    stream: bool = False
+) -> None:
+    """Send a recorded session's requests, `speed` times faster than recorded.
+
+    With `stream`, answers recorded against /api/respond go to /api/respond/stream.
+    """
+    session_started = time.perf_counter()
+    session_id = None
+    for step in steps:
+        delay = session_started + step["at"] / speed - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if step["path"] == "/api/start":
+            data = await metrics.request(client, "/api/start")
+            if data is None:
+                return
+            session_id = data["session_id"]
+        else:
+            path = "/api/respond/stream" if stream and step["path"] == "/api/respond" else step["path"]
+            data = await metrics.respond(client, path, {"session_id": session_id, "value": step["value"]})
+            if data is None:
+                return
+        if data.get("is_complete"):
+            metrics.sessions_completed += 1
+            return
+
+
+def install_fakes(args: argparse.Namespace, spool_dir: str) -> FakeWorksheet:
+    """Swap the model client and the sheet for fakes, and start the app's services.
+
+    Returns the worksheet responses are written to.
+    """
+    questionnaire = main.questionnaire
+    questionnaire.initialize()
+    if args.synthetic or not questionnaire.question_loader.questions:
+        questions = make_questions(args.synthetic or 20, seed=args.seed)
+        questionnaire.question_loader.questions = questions
+        questionnaire.question_loader.compiled = CompiledQuestionnaire(questions)
+    if args.no_bank:
+        questionnaire.ai_client.phrasing_bank = None
+
+    questionnaire.ai_client.client = FakeGenaiClient(
+        LatencyModel(args.ai_latency, args.ai_sigma, args.ai_error_rate, seed=args.seed),
+        rpm_quota=args.ai_rpm_quota
+    )
+    questionnaire.ai_client.scheduler = AIScheduler(
+        max_in_flight=args.ai_max_in_flight or settings.AI_MAX_IN_FLIGHT,
+        rpm=settings.AI_RPM if args.ai_rpm is None else args.ai_rpm,
+        tpm=settings.AI_TPM,
+        max_backoff=settings.AI_MAX_BACKOFF
+    )
+    questionnaire.ai_client.warm_up()
+
+    sheets_latency = LatencyModel(args.sheets_latency, args.sheets_sigma, args.sheets_error_rate, seed=args.seed + 1)
+    worksheet = FakeWorksheet(list(questionnaire.question_loader.compiled.header), sheets_latency)
+    responses_worksheet = FakeWorksheet(None, sheets_latency)
+    settings.SHEETS_LAYOUT = args.sheets_layout
+    storage = FakeSheetsStorage(worksheet, responses_worksheet)
+    # Completed sessions are only queued when a sheet is configured
+    settings.GOOGLE_SHEET_ID = settings.GOOGLE_SHEET_ID or "fake-sheet"
+    main.write_queue = WriteBehindQueue(
+        lambda: storage,
+        spool_dir,
+        batch_size=settings.WRITE_BATCH_SIZE,
+        max_retry_delay=5
+    )
+    return responses_worksheet if storage.row_layout else worksheet
+
+
+def report(metrics: LoadMetrics, elapsed: float, worksheet: FakeWorksheet) -> None:
+    print(f"\n{'endpoint':<16} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    total = 0
+    for path, samples in sorted(metrics.latencies.items()):
+        total += len(samples)
+        print(
+            f"{path:<16} {len(samples):>7} {metrics.errors[path]:>7} "
+            f"{percentile(samples, 50) * 1000:>9.1f} {percentile(samples, 95) * 1000:>9.1f} "
+            f"{percentile(samples, 99) * 1000:>9.1f}"
+        )
+    for path, samples in sorted(metrics.first_event.items()):
+        print(
+            f"{'  first event':<16} {len(samples):>7} {'':>7} "
+            f"{percentile(samples, 50) * 1000:>9.1f} {percentile(samples, 95) * 1000:>9.1f} "
+            f"{percentile(samples, 99) * 1000:>9.1f}"
+        )
+
+    print(f"\nThroughput: {total / elapsed:.1f} req/s, "
+          f"{metrics.sessions_completed / elapsed:.2f} completed sessions/s over {elapsed:.1f}s")
+    lag = metrics.loop_lag
+    print(f"Event loop lag: p50 {percentile(lag, 50) * 1000:.1f} ms, p99 {percentile(lag, 99) * 1000:.1f} ms, "
+          f"max {max(lag, default=0) * 1000:.1f} ms")
+
+    ai_stats = main.questionnaire.ai_client.stats
+    scheduler = main.questionnaire.ai_client.scheduler.health()
+    print(f"AI scheduler: {scheduler['queued']} of {scheduler['started']} calls queued, "
+          f"{scheduler['rate_limited']} rate limited")
+    print(f"AI calls: {sum(ai_stats['calls'].values())}, errors: {sum(ai_stats['errors'].values())}, "
+          f"over budget: {sum(ai_stats['budget_exceeded'].values())}, "
+          f"cache hits: {sum(ai_stats['cache_hits'].values())}, coalesced: {sum(ai_stats['coalesced'].values())}")
+    saved = worksheet.saved_rows if settings.SHEETS_LAYOUT == "rows" else worksheet.saved_columns
+    print(f"Sheets: {saved} sessions saved, {main.write_queue.pending} pending, "
+          f"{worksheet.calls['errors']} errors in {sum(worksheet.calls.values()) - worksheet.calls['errors']} calls")
+
+
+async def run(args: argparse.Namespace) -> None:
+    metrics = LoadMetrics()
+    trace: list[dict] | None = [] if args.record else None
+
+    with tempfile.TemporaryDirectory() as spool_dir:
+        worksheet = install_fakes(args, spool_dir)
+        await main.write_queue.start()
+        lag_task = asyncio.create_task(metrics.monitor_loop_lag())
+
+        transport = httpx.ASGITransport(app=main.app)
+        started = time.perf_counter()
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as client:
+            if args.replay:
+                sessions = [json.loads(line) for line in Path(args.replay).read_text().splitlines() if line.strip()]
+
+                async def replay(session: dict) -> None:
+                    await asyncio.sleep(session["start"] / args.speed)
+                    await replay_session(client, metrics, session["steps"], args.speed, args.stream)
+
+                await asyncio.gather(*(replay(session) for session in sessions))
+            else:
+                rng = random.Random(args.seed)
+                respond_path = "/api/respond/stream" if args.stream else "/api/respond"
+                remaining = args.sessions
+                deadline = started + args.duration if args.duration else None
+
+                async def user() -> None:
+                    nonlocal remaining
+                    while remaining > 0 and (deadline is None or time.perf_counter() < deadline):
+                        remaining -= 1
+                        await simulated_user(
+                            client, metrics, rng, args.invalid_rate, args.think_time, trace, respond_path
+                        )
+
+                await asyncio.gather(*(user() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        # Give the write-behind queue a moment to drain before reporting
+        drain_deadline = time.perf_counter() + args.drain_timeout
+        while main.write_queue.pending and time.perf_counter() < drain_deadline:
+            await asyncio.sleep(0.1)
+        lag_task.cancel()
+        await main.write_queue.stop()
+
+    report(metrics, elapsed, worksheet)
+
+    if trace is not None:
+        with open(args.record, "w") as f:
+            for session in sorted(trace, key=lambda s: s["start"]):
+                session["start"] -= started
+                f.write(json.dumps(session) + "\n")
+        print(f"Recorded {len(trace)} sessions to {args.record}")
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description="Load test the questionnaire API with fake backends")
+    parser.add_argument("--concurrency", type=int, default=20, help="Simulated users running at once")
+    parser.add_argument("--sessions", type=int, default=200, help="Sessions to complete in total")
+    parser.add_argument("--duration", type=float, help="Stop starting sessions after this many seconds")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean seconds a user takes per answer")
+    parser.add_argument("--invalid-rate", type=float, default=0.05, help="Fraction of answers that are invalid")
+    parser.add_argument("--synthetic", type=int, help="Use a synthetic questionnaire of this size")
+    parser.add_argument("--no-bank", action="store_true", help="Ignore the phrasing bank (every question hits the AI)")
+    parser.add_argument("--ai-latency", type=float, default=0.8, help="Median fake model latency (seconds)")
+    parser.add_argument("--ai-sigma", type=float, default=0.5, help="Spread of the model latency (lognormal sigma)")
+    parser.add_argument("--ai-error-rate", type=float, default=0.01)
+    parser.add_argument("--ai-rpm-quota", type=int, default=0,
+                        help="Fake model quota in requests per minute, 429s beyond it (0 = none)")
+    parser.add_argument("--ai-max-in-flight", type=int, help="Scheduler limit (default: AI_MAX_IN_FLIGHT)")
+    parser.add_argument("--ai-rpm", type=int, help="Scheduler requests per minute (default: AI_RPM)")
+    parser.add_argument("--sheets-latency", type=float, default=0.3, help="Median fake Sheets latency (seconds)")
+    parser.add_argument("--sheets-sigma", type=float, default=0.5)
+    parser.add_argument("--sheets-error-rate", type=float, default=0.02)
+    parser.add_argument("--sheets-layout", choices=["columns", "rows"], default="columns",
+                        help="Response layout to write (see SHEETS_LAYOUT)")
+    parser.add_argument("--drain-timeout", type=float, default=30.0,
+                        help="Seconds to wait for queued saves after the load")
+    parser.add_argument("--stream", action="store_true",
+                        help="Answer through /api/respond/stream (as the web client does) and report time to first event")
+    parser.add_argument("--record", help="Write the simulated sessions to this trace file")
+    parser.add_argument("--replay", help="Replay a recorded trace instead of simulating users")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed-up factor")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,233 @@
+"""Microbenchmarks for the per-answer hot path.
+
+Usage (from the project root):
+
+    uv run python -m benchmarks.run [--questions 200] [--skip-density 0.3] [--chain-depth 5]
+    uv run python -m benchmarks.run --save-baseline     # record benchmarks/baseline.json
+    uv run python -m benchmarks.run --threshold 0.2     # exit 1 on a >20% regression (or no baseline)
+
+Each benchmark reports operations per second (best of several repeats) and
+the peak bytes allocated by one operation (tracemalloc). The memory held by
+one completed session is reported as bytes per session.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+from benchmarks.synthetic import StubAIClient, invalid_answer, make_questions, make_sheet_texts, valid_answer
+from core import CompiledQuestionnaire, Questionnaire, SessionState
+from storage import GoogleSheetsStorage
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+# Allocation changes smaller than this are noise, whatever the threshold
+ALLOC_SLACK_BYTES = 1024
+
+
+def measure(fn: Callable[[], object], min_time: float = 1.0, repeats: int = 7) -> dict:
+    """Ops/sec (best of `repeats`) and peak bytes allocated by one call."""
+    fn()  # warm-up
+
+    def timed(number: int) -> float:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        return time.perf_counter() - started
+
+    # Like timeit, keep collection pauses out of the timings
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        number = 1
+        while (elapsed := timed(number)) < min_time / repeats:
+            number *= 2
+        best = min([elapsed] + [timed(number) for _ in range(repeats - 1)])
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"ops_per_sec": round(number / best, 1), "peak_bytes": max(peak - before, 0)}
+
+
+def measure_retained(build: Callable[[], object], count: int) -> int:
+    """Bytes kept alive per object, averaged over `count` objects from `build`."""
+    build()  # warm-up
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        kept = [build() for _ in range(count)]
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del kept
+    return round((after - before) / count)
+
+
+def build_benchmarks(args: argparse.Namespace) -> dict[str, Callable[[], object]]:
+    """Benchmark name -> function running one operation."""
+    rng = random.Random(args.seed)
+    questions = make_questions(args.questions, args.skip_density, args.chain_depth, args.seed)
+    compiled = CompiledQuestionnaire(questions)
+    answers = [valid_answer(q, rng) for q in questions]
+    invalid = [invalid_answer(q) for q in questions]
+
+    questionnaire = Questionnaire()
+    questionnaire.ai_client = StubAIClient()
+    questionnaire.question_loader.questions = questions
+    questionnaire.question_loader.compiled = compiled
+
+    def validate():
+        # One valid and one invalid answer per question
+        for idx in range(len(compiled)):
+            compiled.validate(idx, answers[idx])
+            compiled.validate(idx, invalid[idx])
+
+    def skip_walk():
+        # Record every answer and advance through the skip chains
+        session = SessionState("bench", questions_version=compiled.version, size=len(compiled))
+        question = questionnaire._next_question(session)
+        while question:
+            idx = session.current_question_index
+            questionnaire._record_response(session, idx, answers[idx])
+            session.current_question_index += 1
+            question = questionnaire._next_question(session)
+        return session
+
+    completed = skip_walk()
+
+    def sheet_row():
+        return questionnaire.get_responses_for_sheet_row(completed)
+
+    sheets = GoogleSheetsStorage.__new__(GoogleSheetsStorage)  # parsing needs no connection
+    sheet_texts = make_sheet_texts(args.questions)
+
+    def parse_questions():
+        for text in sheet_texts:
+            sheets._parse_question(text)
+
+    loop = asyncio.new_event_loop()
+
+    async def answer_all():
+        session = await questionnaire.create_session()
+        await questionnaire.start_session(session)
+        while not session.completed:
+            await questionnaire.process_response(session, answers[session.current_question_index])
+        await questionnaire.sessions.aoffload(session)
+
+    def process_session():
+        loop.run_until_complete(answer_all())
+
+    return {
+        "validate": validate,
+        "skip_walk": skip_walk,
+        "sheet_row": sheet_row,
+        "parse_question": parse_questions,
+        "process_session": process_session,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Regressions of more than `threshold` against the baseline."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["ops_per_sec"] < base["ops_per_sec"] * (1 - threshold):
+            regressions.append(
+                f"{name}: {result['ops_per_sec']:.1f} ops/sec vs {base['ops_per_sec']:.1f} baseline"
+            )
+        if result["peak_bytes"] > base["peak_bytes"] * (1 + threshold) + ALLOC_SLACK_BYTES:
+            regressions.append(
+                f"{name}: {result['peak_bytes']} peak bytes vs {base['peak_bytes']} baseline"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the per-answer hot path")
+    parser.add_argument("--questions", type=int, default=200, help="Questions in the synthetic questionnaire")
+    parser.add_argument("--skip-density", type=float, default=0.3,
+                        help="Fraction of questions with a skip condition")
+    parser.add_argument("--chain-depth", type=int, default=5, help="Longest chain of dependent skips")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-time", type=float, default=1.0, help="Seconds spent timing each benchmark")
+    parser.add_argument("--only", nargs="*", help="Run only these benchmarks")
+    parser.add_argument("--sessions", type=int, default=1000,
+                        help="Completed sessions kept when measuring bytes per session")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--threshold", type=float,
+                        help="Allowed slowdown or allocation growth before failing (default 0.2 = 20%%); "
+                             "when given, a missing or mismatched baseline fails too")
+    args = parser.parse_args()
+
+    config = {
+        "questions": args.questions,
+        "skip_density": args.skip_density,
+        "chain_depth": args.chain_depth,
+        "seed": args.seed,
+    }
+    all_benchmarks = build_benchmarks(args)
+    benchmarks = all_benchmarks
+    if args.only:
+        benchmarks = {name: fn for name, fn in all_benchmarks.items() if name in args.only}
+
+    results = {}
+    for name, fn in benchmarks.items():
+        results[name] = measure(fn, args.min_time)
+        print(f"{name:<16} {results[name]['ops_per_sec']:>12,.1f} ops/sec {results[name]['peak_bytes']:>12,} peak bytes")
+
+    # A completed session, answers and skip state included
+    session_bytes = measure_retained(all_benchmarks["skip_walk"], args.sessions)
+    print(f"{'session_memory':<16} {session_bytes:>12,} bytes/session")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(
+            {"config": config, "results": results, "session_bytes": session_bytes}, indent=2
+        ) + "\n")
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    # An explicit threshold is a gate (e.g. in CI), which must not pass without comparing
+    gate = args.threshold is not None
+    threshold = args.threshold if gate else 0.2
+
+    if not args.baseline.exists():
+        print("No baseline to compare against, run with --save-baseline to record one.")
+        return 1 if gate else 0
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("config") != config:
+        print(f"Warning: Baseline was recorded with {baseline.get('config')}, not comparing")
+        return 1 if gate else 0
+
+    regressions = compare(results, baseline["results"], threshold)
+    base_bytes = baseline.get("session_bytes")
+    if base_bytes and session_bytes > base_bytes * (1 + threshold) + ALLOC_SLACK_BYTES:
+        regressions.append(f"session_memory: {session_bytes} bytes/session vs {base_bytes} baseline")
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print(f"No regressions beyond {threshold:.0%} of the baseline.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import random
+from typing import Any
+from core import AIClient
+from models import Question, QuestionType
+
+QUESTION_TYPES = [
+    QuestionType.TEXT,
+    QuestionType.NUMERIC,
+    QuestionType.YES_NO,
+    QuestionType.RADIO,
+    QuestionType.CHECKBOX,
+    QuestionType.DATE,
+]
+OPTIONS = ["Option A", "Option B", "Option C", "Option D"]
+
+
+def make_questions(size: int = 200, skip_density: float = 0.3, chain_depth: int = 5, seed: int = 0) -> list[Question]:
+    """Synthetic questionnaire covering every question type.
+
+    About `skip_density` of the questions get a skip condition. Conditions
+    either start a chain (skip when an earlier Yes/No answer is False) or
+    extend the current one (skip when the previous skippable question is
+    N/A), up to `chain_depth` questions deep.
+    """
+    rng = random.Random(seed)
+    questions = []
+    yes_no_ids: list[str] = []
+    chain_tail: str | None = None
+    depth = 0
+
+    for i in range(size):
+        q_type = QUESTION_TYPES[i % len(QUESTION_TYPES)]
+        question = {"id": f"q{i + 1}", "text": f"Question {i + 1}?", "type": q_type}
+        if q_type in (QuestionType.RADIO, QuestionType.CHECKBOX):
+            question["options"] = OPTIONS
+        elif q_type == QuestionType.NUMERIC:
+            question["min"] = 0
+            question["max"] = 120
+        elif q_type == QuestionType.DATE:
+            question["text"] = f"What is your date of birth ({i + 1})?"
+
+        if yes_no_ids and rng.random() < skip_density:
+            if chain_tail and depth < chain_depth:
+                condition = {"question_id": chain_tail, "operator": "equals", "value": "N/A"}
+                depth += 1
+            else:
+                condition = {"question_id": rng.choice(yes_no_ids), "operator": "equals", "value": False}
+                depth = 1
+            question["skip_when"] = [condition]
+            chain_tail = question["id"]
+
+        if q_type == QuestionType.YES_NO:
+            yes_no_ids.append(question["id"])
+        questions.append(Question(**question))
+
+    return questions
+
+
+def valid_answer(question: Question, rng: random.Random) -> Any:
+    match question.type:
+        case QuestionType.NUMERIC:
+            return rng.randint(18, 99)
+        case QuestionType.YES_NO:
+            return rng.random() < 0.5
+        case QuestionType.RADIO:
+            return rng.choice(OPTIONS)
+        case QuestionType.CHECKBOX:
+            return rng.sample(OPTIONS, 2)
+        case QuestionType.DATE:
+            return "1990-05-21"
+    return "A short answer"
+
+
+def invalid_answer(question: Question) -> Any:
+    match question.type:
+        case QuestionType.NUMERIC:
+            return "forty"
+        case QuestionType.YES_NO:
+            return "maybe"
+        case QuestionType.RADIO:
+            return "Option Z"
+        case QuestionType.CHECKBOX:
+            return ["Option A", "Option Z"]
+        case QuestionType.DATE:
+            return "21/05/1990"
+    return "   "
+
+
+def make_sheet_texts(size: int = 200) -> list[str]:
+    """Column A cells in the formats GoogleSheetsStorage._parse_question understands."""
+    templates = [
+        "What is your full name?",
+        "How old are you?",
+        "Do you have a smart meter?",
+        "[radio] Which brand do you use? (Brand A, Brand B, Brand C)",
+        "[checkbox] Which features do you use? (Alerts, Reports, Export, API)",
+        "What is your date of birth?",
+        "Preferred contact (Email, Phone, Post)",
+        "[number] How many people live in your home?",
+    ]
+    return [templates[i % len(templates)] for i in range(size)]
+
+
+class StubAIClient(AIClient):
+    """AIClient with canned model replies, so benchmarks measure our code only."""
+
+    async def _call_model(self, full_prompt: str) -> str:
+        return "Thanks! Here is the next question?"
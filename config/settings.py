@@ -11,6 +11,26 @@ class Settings:
     MODEL: str = os.getenv("MODEL", "")
     MODEL_API_KEY: str = os.getenv("MODEL_API_KEY", "")
 
+    # Latency budgets (seconds) for AI calls, after which a fallback message is used
+    AI_BUDGET_PRESENT: float = float(os.getenv("AI_BUDGET_PRESENT", "2.5"))
+    AI_BUDGET_CLARIFY: float = float(os.getenv("AI_BUDGET_CLARIFY", "3"))
+    AI_BUDGET_COMPLETE: float = float(os.getenv("AI_BUDGET_COMPLETE", "3"))
+    # Send a second, hedged request if the first is slower than this (0 = disabled)
+    AI_HEDGE_AFTER: float = float(os.getenv("AI_HEDGE_AFTER", "0"))
+
+    # AI call scheduler: concurrent calls, and the model quota in requests and
+    # tokens per minute (0 = no limit). After a 429 calls pause, up to AI_MAX_BACKOFF seconds
+    AI_MAX_IN_FLIGHT: int = int(os.getenv("AI_MAX_IN_FLIGHT", "16"))
+    AI_RPM: int = int(os.getenv("AI_RPM", "0"))
+    AI_TPM: int = int(os.getenv("AI_TPM", "0"))
+    AI_MAX_BACKOFF: float = float(os.getenv("AI_MAX_BACKOFF", "30"))
+
+    # Cache of AI replies to identical prompts (size 0 = disabled)
+    AI_CACHE_SIZE: int = int(os.getenv("AI_CACHE_SIZE", "1000"))
+    AI_CACHE_TTL: float = float(os.getenv("AI_CACHE_TTL", "3600"))
+    # Different replies collected per prompt before cached ones are reused
+    AI_CACHE_VARIANTS: int = int(os.getenv("AI_CACHE_VARIANTS", "5"))
+
     # Google Sheets
     GOOGLE_SHEET_ID: str = os.getenv("GOOGLE_SHEET_ID", "")
     
@@ -30,8 +50,44 @@ class Settings:
         "QUESTIONS_JSON_FILE",
         str(BASE_DIR / "questions.json")
     )
+    # Seconds between checks for edited questions (0 = load once at startup)
+    QUESTIONS_RELOAD_INTERVAL: float = float(os.getenv("QUESTIONS_RELOAD_INTERVAL", "30"))
 
     # Single sheet name (Column A = Questions, Column B = Responses)
     SHEET_NAME: str = os.getenv("SHEET_NAME", "Sheet1")
+    # Response layout: "columns" (a column per session next to the questions) or
+    # "rows" (a row per session, appended to the SHEETS_RESPONSES_WORKSHEET tab)
+    SHEETS_LAYOUT: str = os.getenv("SHEETS_LAYOUT", "columns")
+    SHEETS_RESPONSES_WORKSHEET: str = os.getenv("SHEETS_RESPONSES_WORKSHEET", "Responses")
+
+    # Pre-generated question phrasings (built with scripts/build_phrasing_bank.py)
+    PHRASING_BANK_FILE: str = os.getenv(
+        "PHRASING_BANK_FILE",
+        str(BASE_DIR / "phrasing_bank.json")
+    )
+    PHRASING_BANK_SIZE: int = int(os.getenv("PHRASING_BANK_SIZE", "5"))
+
+    # Session backend: "memory" (single worker), "sqlite" (workers on one host) or "redis"
+    SESSION_BACKEND: str = os.getenv("SESSION_BACKEND", "memory")
+    SESSION_DB_FILE: str = os.getenv("SESSION_DB_FILE", str(BASE_DIR / "sessions.db"))
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    # Sessions: idle timeout and hard cap (least recently used evicted first)
+    SESSION_TTL_SECONDS: float = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+    MAX_SESSIONS: int = int(os.getenv("MAX_SESSIONS", "10000"))
+
+    # Where completed sessions are saved: "sheets" (directly), or locally in
+    # "sqlite" or "jsonl" and exported to Sheets every SHEETS_EXPORT_INTERVAL seconds
+    RESPONSE_STORAGE: str = os.getenv("RESPONSE_STORAGE", "sheets")
+    RESPONSE_DB_FILE: str = os.getenv("RESPONSE_DB_FILE", str(BASE_DIR / "responses.db"))
+    RESPONSE_LOG_DIR: str = os.getenv("RESPONSE_LOG_DIR", str(BASE_DIR / "responses"))
+    RESPONSE_LOG_SEGMENT_BYTES: int = int(os.getenv("RESPONSE_LOG_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+    SHEETS_EXPORT_INTERVAL: float = float(os.getenv("SHEETS_EXPORT_INTERVAL", "60"))
+    SHEETS_EXPORT_BATCH_SIZE: int = int(os.getenv("SHEETS_EXPORT_BATCH_SIZE", "500"))
+
+    # Write-behind queue for completed sessions (spooled locally until saved)
+    SPOOL_DIR: str = os.getenv("SPOOL_DIR", str(BASE_DIR / "spool"))
+    WRITE_BATCH_SIZE: int = int(os.getenv("WRITE_BATCH_SIZE", "20"))
+    WRITE_MAX_RETRY_DELAY: float = float(os.getenv("WRITE_MAX_RETRY_DELAY", "300"))
 
 settings = Settings()
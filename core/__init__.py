@@ -1,5 +1,27 @@
 from .ai_client import AIClient
+from .clarification import ClarificationEngine
+from .compiled import CompiledQuestionnaire
+from .phrasing_bank import PhrasingBank
 from .question_loader import QuestionLoader
 from .questionnaire import Questionnaire
+from .session import SessionState
+from .session_store import (
+    SessionBackend,
+    MemorySessionBackend,
+    SQLiteSessionBackend,
+    RedisSessionBackend,
+)
 
-__all__ = ["AIClient", "QuestionLoader", "Questionnaire"]
+__all__ = [
+    "AIClient",
+    "ClarificationEngine",
+    "CompiledQuestionnaire",
+    "PhrasingBank",
+    "QuestionLoader",
+    "Questionnaire",
+    "SessionState",
+    "SessionBackend",
+    "MemorySessionBackend",
+    "SQLiteSessionBackend",
+    "RedisSessionBackend",
+]
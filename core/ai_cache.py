@@ -0,0 +1,91 @@
+import asyncio
+import hashlib
+import random
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+def prompt_key(kind: str, prompt: str) -> str:
+    """Cache key for a prompt of a given kind."""
+    return f"{kind}:{hashlib.sha256(prompt.encode('utf-8')).hexdigest()}"
+
+
+class PromptCache:
+    """Bounded LRU cache of model replies with a TTL.
+
+    Each prompt keeps a pool of up to `variants` different replies. Until
+    the pool is full `get` misses, so new replies keep being generated;
+    after that a random reply from the pool is served, so repeated prompts
+    don't all get the same text.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600, variants: int = 3):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.variants = variants
+        self._entries: OrderedDict[str, tuple[list[str], float]] = OrderedDict()
+
+    def get(self, key: str) -> str | None:
+        """Return a cached reply, or None if the pool for this prompt isn't full yet."""
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+
+        replies, created = entry
+        if time.monotonic() - created > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        if len(replies) < self.variants:
+            return None
+
+        self._entries.move_to_end(key)
+        return random.choice(replies)
+
+    def add(self, key: str, reply: str) -> None:
+        """Add a reply to the pool for a prompt."""
+        if self.max_entries <= 0:
+            return
+
+        entry = self._entries.get(key)
+        if entry and time.monotonic() - entry[1] <= self.ttl_seconds:
+            replies = entry[0]
+            if len(replies) < self.variants:
+                replies.append(reply)
+        else:
+            self._entries[key] = ([reply], time.monotonic())
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls into one in-flight call.
+
+    Callers that arrive while a call for the same key is running wait for
+    its result instead of starting their own. A caller being cancelled does
+    not cancel the shared call for the others.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._calls)
@@ -1,13 +1,74 @@
-from google import genai
-from google.genai import types
+import asyncio
+import time
+from collections import Counter
+from contextlib import aclosing
+from typing import TYPE_CHECKING, AsyncIterator
 from config import settings
 from models import Question, QuestionType
+from .ai_cache import PromptCache, SingleFlight, prompt_key
+from .ai_scheduler import AIScheduler, is_rate_limited
+from .metrics import AI_FALLBACKS, AI_QUEUE_SECONDS, AI_RATE_LIMITED, AI_SECONDS
+from .phrasing_bank import PhrasingBank
+
+if TYPE_CHECKING:
+    from google import genai
+    from google.genai import types
+
+SENTENCE_SEPARATORS = ['. ', '? ', '! ']
+# Characters buffered before streaming a phrasing (long enough to spot "Of course!")
+MIN_STREAM_PREFIX = 12
+MAX_OUTPUT_TOKENS = 256
+
+
+def strip_filler(text: str) -> str:
+    """Remove common AI additions from a phrasing."""
+    return text.replace("Sure!", "").replace("Of course!", "")
 
 
 class AIClient:
     def __init__(self):
-        self.client = genai.Client(api_key=settings.MODEL_API_KEY)
+        # google.genai is slow to import, so the client is built on first use
+        self._client: "genai.Client | None" = None
+        self._generate_config: "types.GenerateContentConfig | None" = None
         self.model = settings.MODEL
+        self.phrasing_bank: PhrasingBank | None = None
+
+        # Latency budget (seconds) per kind of prompt, after which the fallback is used
+        self.budgets = {
+            "present": settings.AI_BUDGET_PRESENT,
+            "clarify": settings.AI_BUDGET_CLARIFY,
+            "complete": settings.AI_BUDGET_COMPLETE,
+        }
+        self.hedge_after = settings.AI_HEDGE_AFTER
+        # Scheduling priority per kind of prompt (lower starts first when calls queue)
+        self.priorities = {
+            "present": 0,
+            "clarify": 0,
+            "complete": 1,
+        }
+        self.scheduler = AIScheduler(
+            max_in_flight=settings.AI_MAX_IN_FLIGHT,
+            rpm=settings.AI_RPM,
+            tpm=settings.AI_TPM,
+            max_backoff=settings.AI_MAX_BACKOFF
+        )
+        self.stats = {
+            "calls": Counter(),
+            "errors": Counter(),
+            "budget_exceeded": Counter(),
+            "hedged": Counter(),
+            "hedge_wins": Counter(),
+            "cache_hits": Counter(),
+            "coalesced": Counter(),
+        }
+
+        # Identical prompts share one in-flight call, and repeats are cached
+        self.single_flight = SingleFlight()
+        self.cache = PromptCache(
+            max_entries=settings.AI_CACHE_SIZE,
+            ttl_seconds=settings.AI_CACHE_TTL,
+            variants=settings.AI_CACHE_VARIANTS
+        )
 
         self.context = """You are a friendly, warm questionnaire assistant. Your role is to:
 1. Present questions in a conversational, approachable way
@@ -22,26 +83,249 @@ Guidelines:
 - For clarification, be specific about what needs to be clearer
 - Never repeat the exact question text, rephrase it naturally"""
 
-    async def _generate(self, prompt: str) -> str:
-        """Generate response from the AI model."""
+    @property
+    def client(self) -> "genai.Client":
+        """The genai client, imported and built on first use."""
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client(api_key=settings.MODEL_API_KEY)
+        return self._client
+
+    @client.setter
+    def client(self, client) -> None:
+        self._client = client
+
+    def warm_up(self) -> None:
+        """Do the slow imports and client setup now rather than on the first request."""
+        self.client
+        self._config()
+
+    def _config(self) -> "types.GenerateContentConfig":
+        if self._generate_config is None:
+            from google.genai import types
+            self._generate_config = types.GenerateContentConfig(
+                max_output_tokens=MAX_OUTPUT_TOKENS,
+                temperature=0.7
+            )
+        return self._generate_config
+
+    async def _call_model(self, full_prompt: str) -> str:
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=full_prompt,
+            config=self._config()
+        )
+        return response.text.strip()
+
+    def _estimate_tokens(self, full_prompt: str) -> int:
+        """Rough token count of a call (about 4 characters per token, plus the reply)."""
+        return len(full_prompt) // 4 + MAX_OUTPUT_TOKENS
+
+    async def _acquire(self, full_prompt: str, kind: str) -> None:
+        """Wait for the scheduler to let a call of this kind start."""
+        started = time.perf_counter()
+        await self.scheduler.acquire(self._estimate_tokens(full_prompt), self.priorities.get(kind, 0))
+        AI_QUEUE_SECONDS.observe(time.perf_counter() - started, kind=kind)
+
+    def _release(self, kind: str, error: BaseException | None = None) -> None:
+        rate_limited = error is not None and is_rate_limited(error)
+        if rate_limited:
+            AI_RATE_LIMITED.inc(kind=kind)
+        self.scheduler.release(rate_limited)
+
+    async def _scheduled_call(self, full_prompt: str, kind: str) -> str:
+        """Call the model once the scheduler has a slot and quota for it."""
+        await self._acquire(full_prompt, kind)
+        error = None
+        try:
+            return await self._call_model(full_prompt)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._release(kind, error)
+
+    async def _generate(self, prompt: str, kind: str = "present") -> str:
+        """Generate response from the AI model, sharing identical prompts.
+
+        Repeats are served from the prompt cache once it holds enough
+        variants, and concurrent identical prompts share one in-flight call.
+        """
         full_prompt = f"{self.context}\n\n{prompt}"
+        key = prompt_key(kind, full_prompt)
+
+        with AI_SECONDS.time(kind=kind):
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.stats["cache_hits"][kind] += 1
+                return cached
+
+            if self.single_flight.in_flight(key):
+                self.stats["coalesced"][kind] += 1
+            result = await self.single_flight.do(key, lambda: self._generate_uncached(full_prompt, kind, key))
+
+        if result is None:
+            AI_FALLBACKS.inc(kind=kind)
+        return result
+
+    async def _generate_uncached(self, full_prompt: str, kind: str, key: str) -> str:
+        """Call the AI model within the latency budget for `kind`.
+
+        Time spent waiting for the scheduler counts towards the budget.
+        Returns None (so callers use their fallback text) on errors or when
+        the budget runs out; the in-flight call is cancelled. If hedging is
+        enabled, a second identical request is started once the first has
+        taken longer than AI_HEDGE_AFTER, and whichever finishes first wins.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.budgets.get(kind, settings.AI_BUDGET_PRESENT)
+        self.stats["calls"][kind] += 1
+
+        primary = asyncio.create_task(self._scheduled_call(full_prompt, kind))
+        in_flight = {primary}
         try:
-            response = await self.client.aio.models.generate_content(
-                model=self.model,
-                contents=full_prompt,
-                config=types.GenerateContentConfig(
-                    max_output_tokens=256,
-                    temperature=0.7
+            hedge_at = loop.time() + self.hedge_after
+            if self.hedge_after and hedge_at < deadline:
+                done, _ = await asyncio.wait(in_flight, timeout=self.hedge_after)
+                if not done:
+                    in_flight.add(asyncio.create_task(self._scheduled_call(full_prompt, kind)))
+                    self.stats["hedged"][kind] += 1
+
+            while in_flight:
+                remaining = deadline - loop.time()
+                done, in_flight = await asyncio.wait(
+                    in_flight,
+                    timeout=max(remaining, 0),
+                    return_when=asyncio.FIRST_COMPLETED
                 )
+                if not done:
+                    self.stats["budget_exceeded"][kind] += 1
+                    print(f"AI Error: {kind} call exceeded its latency budget")
+                    return None
+
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats["hedge_wins"][kind] += 1
+                        self.cache.add(key, task.result())
+                        return task.result()
+                    self.stats["errors"][kind] += 1
+                    print(f"AI Error: {task.exception()}")
+
+            # Return simple fallback
+            return None
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def _generate_stream(self, prompt: str, kind: str = "present") -> AsyncIterator[str]:
+        """Stream response text from the AI model. Stops on error or when the budget runs out.
+
+        A reply streamed to the end is added to the prompt cache.
+        """
+        full_prompt = f"{self.context}\n\n{prompt}"
+        key = prompt_key(kind, full_prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.stats["cache_hits"][kind] += 1
+            yield cached
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.budgets.get(kind, settings.AI_BUDGET_PRESENT)
+        self.stats["calls"][kind] += 1
+        started = time.perf_counter()
+
+        acquired = False
+        error = None
+        try:
+            await asyncio.wait_for(self._acquire(full_prompt, kind), timeout=deadline - loop.time())
+            acquired = True
+            stream = await asyncio.wait_for(
+                self.client.aio.models.generate_content_stream(
+                    model=self.model,
+                    contents=full_prompt,
+                    config=self._config()
+                ),
+                timeout=deadline - loop.time()
             )
-            return response.text.strip()
+            chunks = aiter(stream)
+            parts = []
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(anext(chunks), timeout=max(deadline - loop.time(), 0))
+                except StopAsyncIteration:
+                    break
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield chunk.text
+            if parts:
+                self.cache.add(key, "".join(parts))
+        except asyncio.TimeoutError:
+            self.stats["budget_exceeded"][kind] += 1
+            AI_FALLBACKS.inc(kind=kind)
+            print(f"AI Error: {kind} stream exceeded its latency budget")
         except Exception as e:
+            error = e
+            self.stats["errors"][kind] += 1
+            AI_FALLBACKS.inc(kind=kind)
             print(f"AI Error: {e}")
-            # Return simple fallback
-            return None
+        finally:
+            if acquired:
+                self._release(kind, error)
+            AI_SECONDS.observe(time.perf_counter() - started, kind=kind)
 
     async def present_question(self, question: Question, is_first: bool = False) -> str:
-        prompt = f"""Rewrite this question in a friendly, conversational tone. Output ONLY the rephrased question, nothing else.
+        if self.phrasing_bank:
+            banked = self.phrasing_bank.pick(question, is_first=is_first)
+            if banked:
+                return banked
+
+        result = await self.rephrase_question(question)
+
+        if is_first:
+            return f"Welcome! {result or question.text}"
+
+        return result or question.text
+
+    async def stream_present_question(self, question: Question) -> AsyncIterator[str]:
+        """Stream the phrasing of a question as text deltas.
+
+        Deltas are cleaned up the same way as `rephrase_question` as they
+        arrive, and the stream stops at the end of the first sentence. Apply
+        `clean_phrasing` to the joined deltas for the final text, since the
+        cleanup may still replace an over-long phrasing with the original.
+        """
+        if self.phrasing_bank:
+            banked = self.phrasing_bank.pick(question)
+            if banked:
+                yield banked
+                return
+
+        prompt = self._rephrase_prompt(question)
+        raw = ""
+        emitted = ""
+        # Closed on early return, so the model stream and scheduler slot are released right away
+        async with aclosing(self._generate_stream(prompt)) as chunks:
+            async for chunk in chunks:
+                raw += chunk
+                # Hold back the first few characters so filler like "Of course!" can be dropped
+                if len(raw) < MIN_STREAM_PREFIX:
+                    continue
+                cleaned = self.clean_phrasing(raw, question)
+                if cleaned.startswith(emitted) and len(cleaned) > len(emitted):
+                    yield cleaned[len(emitted):]
+                    emitted = cleaned
+                if any(sep in strip_filler(raw) for sep in SENTENCE_SEPARATORS):
+                    # The first sentence is all that is used; cache it like a full reply
+                    self.cache.add(prompt_key("present", f"{self.context}\n\n{prompt}"), cleaned)
+                    return
+
+        if raw and not emitted:
+            yield self.clean_phrasing(raw, question)
+
+    def _rephrase_prompt(self, question: Question) -> str:
+        return f"""Rewrite this question in a friendly, conversational tone. Output ONLY the rephrased question, nothing else.
 
 Original: {question.text}
 
@@ -52,26 +336,29 @@ Rules:
 - No follow-up questions
 - Just the question itself, rephrased naturally"""
 
-        result = await self._generate(prompt)
+    def clean_phrasing(self, result: str, question: Question) -> str:
+        """Strict cleanup of a model rephrasing."""
+        # Remove common AI additions
+        result = strip_filler(result).strip()
+        # Take only first sentence
+        for sep in SENTENCE_SEPARATORS:
+            if sep in result:
+                parts = result.split(sep)
+                result = parts[0] + sep[0]
+                break
+        # If still too long, use original
+        if len(result) > 100:
+            result = question.text
+        return result
+
+    async def rephrase_question(self, question: Question) -> str | None:
+        """Ask the model for a conversational rephrasing of the question."""
+        result = await self._generate(self._rephrase_prompt(question))
 
-        # Strict cleanup
         if result:
-            # Remove common AI additions
-            result = result.replace("Sure!", "").replace("Of course!", "").strip()
-            # Take only first sentence
-            for sep in ['. ', '? ', '! ']:
-                if sep in result:
-                    parts = result.split(sep)
-                    result = parts[0] + sep[0]
-                    break
-            # If still too long, use original
-            if len(result) > 100:
-                result = question.text
+            result = self.clean_phrasing(result, question)
 
-        if is_first:
-            return f"Welcome! {result or question.text}"
-
-        return result or question.text
+        return result
 
     async def appreciate_response(self, question: Question, response_value: str) -> str:
         """Generate a friendly, personalized response based on the answer."""
@@ -142,7 +429,7 @@ Rules:
             return parts[0].capitalize()
         return value.capitalize()
 
-    async def request_clarification(self, question: Question, unclear_response: str) -> str:
+    async def request_clarification(self, question: Question, unclear_response: str, reason: str = "") -> str:
         prompt = f"""The user's response wasn't clear enough. Politely ask for clarification.
 
 Original question: {question.text}
@@ -150,76 +437,15 @@ Question type: {question.type.value}
 {f"Expected options: {', '.join(question.options)}" if question.options else ""}
 {f"Expected range: {question.min_value} to {question.max_value}" if question.min_value is not None else ""}
 User's unclear response: {unclear_response}
+{f"Problem: {reason}" if reason else ""}
 
 Be specific about what format or information you need. Keep it friendly and brief (1-2 sentences)."""
 
-        result = await self._generate(prompt)
+        result = await self._generate(prompt, kind="clarify")
         return result or "Could you please clarify your answer?"
 
     async def completion_message(self) -> str:
         prompt = """The user has completed all questions in the questionnaire. Provide a brief, warm thank you message acknowledging their time and letting them know their responses have been recorded. Keep it to 2 sentences maximum."""
 
-        result = await self._generate(prompt)
+        result = await self._generate(prompt, kind="complete")
         return result or "Thank you for completing the questionnaire! Your responses have been saved."
-
-    def validate_response(self, question: Question, value: str | list | int | float | bool) -> tuple[bool, str]:
-        """Validate response based on question type. Returns (is_valid, error_message)."""
-        if question.required and (value is None or value == "" or value == []):
-            return False, "This question requires an answer."
-
-        if not question.required and (value is None or value == "" or value == []):
-            return True, ""
-
-        match question.type:
-            case QuestionType.NUMERIC:
-                try:
-                    num_val = float(value)
-                    if num_val < 0:
-                        return False, "Please enter a positive number"
-                    if question.min_value is not None and num_val < question.min_value:
-                        return False, f"Value must be at least {question.min_value}"
-                    if question.max_value is not None and num_val > question.max_value:
-                        return False, f"Value must be at most {question.max_value}"
-                except (ValueError, TypeError):
-                    return False, "Please enter a valid number"
-
-            case QuestionType.RADIO:
-                if question.options and value not in question.options:
-                    if not question.allow_other:
-                        return False, f"Please select one of: {', '.join(question.options)}"
-
-            case QuestionType.CHECKBOX:
-                if isinstance(value, list):
-                    if question.options and not question.allow_other:
-                        invalid = [v for v in value if v not in question.options]
-                        if invalid:
-                            return False, f"Invalid options: {', '.join(invalid)}"
-                else:
-                    return False, "Please select options from the list"
-
-            case QuestionType.YES_NO:
-                if str(value).lower() not in ["yes", "no", "true", "false", "1", "0"]:
-                    return False, "Please answer Yes or No"
-
-            case QuestionType.DATE:
-                import re
-                from datetime import datetime, date
-                if not re.match(r"^\d{4}-\d{2}-\d{2}$", str(value)):
-                    return False, "Please enter a valid date (YYYY-MM-DD)"
-                # Check if DOB is in the past
-                q_text = question.text.lower()
-                if "birth" in q_text or "dob" in q_text or "born" in q_text:
-                    try:
-                        entered_date = datetime.strptime(str(value), "%Y-%m-%d").date()
-                        if entered_date >= date.today():
-                            return False, "Date of birth must be in the past"
-                    except ValueError:
-                        return False, "Invalid date"
-
-            case QuestionType.TEXT:
-                if not isinstance(value, str) or len(str(value).strip()) == 0:
-                    if question.required:
-                        return False, "Please provide a text response"
-
-        return True, ""
-
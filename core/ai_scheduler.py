@@ -0,0 +1,162 @@
+import asyncio
+import heapq
+import itertools
+
+
+def is_rate_limited(error: BaseException) -> bool:
+    """Whether an error from the model API is a 429 (quota exceeded)."""
+    return getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429
+
+
+class TokenBucket:
+    """Allows `rate` units per second, in bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (0 if they are now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+class AIScheduler:
+    """Admission control for model calls.
+
+    At most `max_in_flight` calls run at once, and calls are started no
+    faster than the model's quota allows: `rpm` requests and `tpm` tokens
+    per minute (0 = no limit), each enforced by a token bucket. Waiting
+    calls start in priority order (lower first), then in arrival order.
+
+    After a 429 no new calls start for a backoff period. The period doubles
+    with each 429 after it ends (up to `max_backoff` seconds), and halves
+    with each successful call.
+    """
+
+    def __init__(self, max_in_flight: int = 16, rpm: int = 0, tpm: int = 0, max_backoff: float = 30.0):
+        self.max_in_flight = max_in_flight
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_backoff = max_backoff
+        self.in_flight = 0
+        self.backoff = 0.0
+        self._backoff_until = 0.0
+        self._requests: TokenBucket | None = None
+        self._tokens: TokenBucket | None = None
+        self._waiters: list[tuple[int, int, asyncio.Future, int]] = []
+        self._order = itertools.count()
+        self._wakeup: asyncio.TimerHandle | None = None
+        self.stats = {"started": 0, "queued": 0, "rate_limited": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, future, _ in self._waiters if not future.done())
+
+    def _buckets(self, now: float) -> list[tuple[TokenBucket, bool]]:
+        # Created on first use, so they start full at the loop's clock
+        if self.rpm and self._requests is None:
+            self._requests = TokenBucket(self.rpm / 60, self.rpm, now)
+        if self.tpm and self._tokens is None:
+            self._tokens = TokenBucket(self.tpm / 60, self.tpm, now)
+        return [(bucket, is_tokens) for bucket, is_tokens in ((self._requests, False), (self._tokens, True)) if bucket]
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        """Seconds until a call of `tokens` tokens may start (0 if it may now)."""
+        if self.in_flight >= self.max_in_flight:
+            return float("inf")
+        wait = self._backoff_until - now
+        for bucket, is_tokens in self._buckets(now):
+            wait = max(wait, bucket.wait_time(tokens if is_tokens else 1, now))
+        return max(wait, 0.0)
+
+    def _start(self, tokens: int, now: float) -> None:
+        for bucket, is_tokens in self._buckets(now):
+            bucket.take(tokens if is_tokens else 1)
+        self.in_flight += 1
+        self.stats["started"] += 1
+
+    async def acquire(self, tokens: int = 0, priority: int = 0) -> None:
+        """Wait until a call estimated at `tokens` tokens may start.
+
+        Every successful `acquire` must be paired with a `release`.
+        """
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if not self._waiters and self._wait_time(tokens, now) == 0:
+            self._start(tokens, now)
+            return
+
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future, tokens))
+        self.stats["queued"] += 1
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Started just as the caller gave up: hand the slot on
+                self.release()
+            else:
+                self._dispatch()
+            raise
+
+    def release(self, rate_limited: bool = False) -> None:
+        """Mark a call as finished, backing off if it was rejected with a 429."""
+        self.in_flight -= 1
+        loop = asyncio.get_running_loop()
+        if rate_limited:
+            self.stats["rate_limited"] += 1
+            now = loop.time()
+            # Calls rejected together count as one 429
+            if now >= self._backoff_until:
+                self.backoff = min(max(self.backoff * 2, 1.0), self.max_backoff)
+                self._backoff_until = now + self.backoff
+        elif self.backoff:
+            self.backoff = self.backoff / 2 if self.backoff > 1.0 else 0.0
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Start waiting calls in priority order while capacity allows."""
+        loop = asyncio.get_running_loop()
+        if self._wakeup:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        while self._waiters:
+            _, _, future, tokens = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+
+            now = loop.time()
+            wait = self._wait_time(tokens, now)
+            if wait == float("inf"):
+                # Woken again by the next release
+                return
+            if wait > 0:
+                self._wakeup = loop.call_later(wait, self._dispatch)
+                return
+
+            heapq.heappop(self._waiters)
+            self._start(tokens, now)
+            future.set_result(None)
+
+    def health(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.queue_depth,
+            "backoff_seconds": self.backoff,
+            **self.stats,
+        }
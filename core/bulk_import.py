@@ -0,0 +1,211 @@
+import csv
+import json
+import os
+import uuid
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterator
+from models import Question, QuestionType
+from .compiled import CompiledQuestionnaire
+
+# Files larger than this are validated in a process pool by default
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+
+TRUE_VALUES = frozenset(["yes", "true", "1"])
+FALSE_VALUES = frozenset(["no", "false", "0"])
+
+
+def read_rows(path: str | Path) -> Iterator[dict[str, Any]]:
+    """Stream rows of a CSV (with a header row) or JSONL file as dicts."""
+    path = Path(path)
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        if path.suffix.lower() in (".jsonl", ".ndjson"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def coerce_cell(question: Question, value: Any) -> Any:
+    """Turn a raw file value into what the chat client would have sent."""
+    if not isinstance(value, str):
+        return "" if value is None else value
+    value = value.strip()
+    if not value:
+        return ""
+
+    match question.type:
+        case QuestionType.CHECKBOX:
+            # Same format as the sheet cells: "A, B"
+            return [v.strip() for v in value.split(",") if v.strip()]
+        case QuestionType.YES_NO:
+            lowered = value.lower()
+            if lowered in TRUE_VALUES:
+                return True
+            if lowered in FALSE_VALUES:
+                return False
+    return value
+
+
+def validate_chunk(compiled: CompiledQuestionnaire, rows: list[dict], first_row: int) -> tuple[list[dict], list[tuple]]:
+    """Validate a chunk of rows one question column at a time.
+
+    Columns are named by question id or question text. Skip conditions are
+    applied in question order, with N/A for skipped questions, and invalid
+    answers don't count towards later skip conditions, as in the chat flow.
+
+    Returns (accepted sessions ready for save_batch, rejections as
+    (row number, question id, error, raw value)).
+    """
+    column_to_id = {q.id: q.id for q in compiled.questions}
+    column_to_id.update({q.text: q.id for q in compiled.questions})
+    raw_rows = [
+        {column_to_id[column]: value for column, value in row.items() if column in column_to_id}
+        for row in rows
+    ]
+
+    # Answers by question position, None where unanswered or invalid
+    answers: list[list[Any]] = [[None] * len(compiled) for _ in rows]
+    failed: list[list[tuple]] = [[] for _ in rows]
+    skip_rules = compiled.skip_rules
+
+    for idx, question in enumerate(compiled.questions):
+        validate = compiled.validators[idx]
+        column = [coerce_cell(question, raw.get(question.id)) for raw in raw_rows]
+        if skip_rules.conditions[idx]:
+            skip = [skip_rules.should_skip(idx, row_answers) for row_answers in answers]
+        else:
+            skip = None
+
+        for r, value in enumerate(column):
+            if skip and skip[r]:
+                answers[r][idx] = "N/A"
+                continue
+            result = validate(value)
+            if result.is_valid:
+                answers[r][idx] = value
+            else:
+                failed[r].append((first_row + r, question.id, result.message, raw_rows[r].get(question.id, "")))
+
+    accepted = []
+    rejected = []
+    question_ids = list(compiled.ids)  # shared by every session in the chunk
+    for r, row in enumerate(rows):
+        if failed[r]:
+            rejected.extend(failed[r])
+            continue
+        accepted.append({
+            "session_id": row.get("session_id") or str(uuid.uuid4()),
+            "completed_at": row.get("completed_at") or None,
+            "question_ids": question_ids,
+            "responses": compiled.sheet_row(answers[r]),
+        })
+    return accepted, rejected
+
+
+# Per-process questionnaire for pool workers, built once by the initializer
+_worker_compiled: CompiledQuestionnaire | None = None
+
+
+def _init_worker(questions: list[Question]) -> None:
+    global _worker_compiled
+    _worker_compiled = CompiledQuestionnaire(questions)
+
+
+def _validate_in_worker(rows: list[dict], first_row: int) -> tuple[list[dict], list[tuple]]:
+    return validate_chunk(_worker_compiled, rows, first_row)
+
+
+class BulkImporter:
+    """Import completed questionnaires from CSV/JSONL files.
+
+    The file is streamed in chunks of `chunk_size` rows, each validated
+    column by column with the compiled validators (in a process pool when
+    `workers` > 1). Rejected rows go to a CSV report and accepted rows are
+    saved `batch_size` at a time through `storage.save_batch`, or only
+    counted when `storage` is None (dry run).
+    """
+
+    def __init__(
+        self,
+        compiled: CompiledQuestionnaire,
+        storage=None,
+        chunk_size: int = 1000,
+        batch_size: int = 500,
+        workers: int = 1
+    ):
+        self.compiled = compiled
+        self.storage = storage
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.workers = workers
+        self.stats = {"rows": 0, "accepted": 0, "rejected": 0, "saved": 0}
+        self._pending: list[dict] = []
+
+    @staticmethod
+    def default_workers(path: str | Path) -> int:
+        """One process for small files, one per CPU for big ones."""
+        if os.path.getsize(path) >= PARALLEL_MIN_BYTES:
+            return os.cpu_count() or 1
+        return 1
+
+    def _chunks(self, path: str | Path) -> Iterator[tuple[list[dict], int]]:
+        rows = read_rows(path)
+        first_row = 1
+        while chunk := list(islice(rows, self.chunk_size)):
+            yield chunk, first_row
+            first_row += len(chunk)
+
+    def _results(self, path: str | Path) -> Iterator[tuple[list[dict], list[tuple]]]:
+        if self.workers <= 1:
+            for rows, first_row in self._chunks(path):
+                yield validate_chunk(self.compiled, rows, first_row)
+            return
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(list(self.compiled.questions),)
+        ) as pool:
+            # Bound the chunks in flight so big files aren't read into memory
+            in_flight: deque[Future] = deque()
+            for rows, first_row in self._chunks(path):
+                in_flight.append(pool.submit(_validate_in_worker, rows, first_row))
+                if len(in_flight) >= self.workers * 2:
+                    yield in_flight.popleft().result()
+            while in_flight:
+                yield in_flight.popleft().result()
+
+    def _save(self, sessions: list[dict]) -> None:
+        self._pending.extend(sessions)
+        while len(self._pending) >= self.batch_size:
+            self._flush(self._pending[:self.batch_size])
+            del self._pending[:self.batch_size]
+
+    def _flush(self, sessions: list[dict]) -> None:
+        if not sessions or self.storage is None:
+            return
+        if not self.storage.save_batch(sessions):
+            raise RuntimeError(f"Saving failed after {self.stats['saved']} imported rows")
+        self.stats["saved"] += len(sessions)
+
+    def run(self, path: str | Path, rejects_path: str | Path) -> dict:
+        """Import a file and write the rejected-rows report. Returns the stats."""
+        with open(rejects_path, "w", newline="", encoding="utf-8") as f:
+            report = csv.writer(f)
+            report.writerow(["row", "question_id", "error", "value"])
+
+            for accepted, rejected in self._results(path):
+                report.writerows(rejected)
+                rejected_rows = len({row for row, *_ in rejected})
+                self.stats["rows"] += len(accepted) + rejected_rows
+                self.stats["accepted"] += len(accepted)
+                self.stats["rejected"] += rejected_rows
+                self._save(accepted)
+
+        self._flush(self._pending)
+        self._pending = []
+        return self.stats
@@ -0,0 +1,120 @@
+import random
+from typing import Any
+from models import Question, QuestionType
+from .validation import ValidationResult
+
+# Clarification templates per question type and failed validation rule.
+# Placeholders are filled from ValidationResult.params.
+TEMPLATES: dict[QuestionType, dict[str, tuple[str, ...]]] = {
+    QuestionType.NUMERIC: {
+        "required": (
+            "I'll need a number for this one, please.",
+            "Could you enter a number here before we move on?",
+        ),
+        "not_a_number": (
+            "Could you give me that as a number, like 25?",
+            "Hmm, that doesn't look like a number. Could you try again with just digits?",
+            "Just a number works best here, could you enter one?",
+        ),
+        "negative": (
+            "That should be a positive number, could you check it?",
+            "Could you enter a number that's zero or more?",
+        ),
+        "below_min": (
+            "That seems a little low. Could you enter a number of at least {min}?",
+            "Could you double-check that? It should be {min} or more.",
+        ),
+        "above_max": (
+            "That seems a little high. Could you enter a number of at most {max}?",
+            "Could you double-check that? It should be {max} or less.",
+        ),
+    },
+    QuestionType.RADIO: {
+        "required": (
+            "Could you pick one of the options to continue?",
+            "Please choose one of the options before we move on.",
+        ),
+        "not_an_option": (
+            "Could you pick one of these: {options}?",
+            "I didn't quite catch that. Please choose one of: {options}.",
+        ),
+    },
+    QuestionType.CHECKBOX: {
+        "required": (
+            "Could you select at least one option?",
+            "Please tick at least one of the options to continue.",
+        ),
+        "not_a_list": (
+            "Please select your answers from the list of options.",
+            "Could you choose from the options shown?",
+        ),
+        "invalid_options": (
+            "I couldn't match {invalid} to the list. Could you choose from: {options}?",
+            "{invalid} isn't one of the options. Please pick from: {options}.",
+        ),
+    },
+    QuestionType.YES_NO: {
+        "required": (
+            "Just a quick Yes or No will do!",
+            "Could you answer Yes or No to continue?",
+        ),
+        "not_yes_no": (
+            "Could you answer with a simple Yes or No?",
+            "A Yes or No is all I need here.",
+        ),
+    },
+    QuestionType.DATE: {
+        "required": (
+            "Could you pick a date to continue?",
+            "I'll need a date for this one, please.",
+        ),
+        "bad_date_format": (
+            "Could you enter the date as YYYY-MM-DD, for example 1990-05-21?",
+            "That date format didn't quite work. Please use YYYY-MM-DD.",
+        ),
+        "invalid_date": (
+            "That date doesn't seem to exist. Could you check the day and month?",
+            "Hmm, that isn't a valid date. Could you try again?",
+        ),
+        "date_not_past": (
+            "Your date of birth should be in the past. Could you check it?",
+            "That date hasn't happened yet! Could you double-check your date of birth?",
+        ),
+    },
+    QuestionType.TEXT: {
+        "required": (
+            "Could you share a short answer before we move on?",
+            "I'll need a few words for this one, please.",
+        ),
+        "empty_text": (
+            "Could you type a short answer?",
+            "It looks like that was empty. Could you write a few words?",
+        ),
+    },
+}
+
+
+def _format_param(value: Any) -> str:
+    # 18.0 -> "18"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class ClarificationEngine:
+    """Turn validation failures into friendly clarification messages.
+
+    Messages come from typed templates with several variants each, so the
+    common failures (wrong format, out of range, not an option) don't need
+    an AI call. Returns None when no template covers the failure.
+    """
+
+    def __init__(self, templates: dict[QuestionType, dict[str, tuple[str, ...]]] = TEMPLATES):
+        self.templates = templates
+
+    def clarify(self, question: Question, result: ValidationResult) -> str | None:
+        variants = self.templates.get(question.type, {}).get(result.code)
+        if not variants:
+            return None
+        params = {key: _format_param(value) for key, value in result.params.items()}
+        return random.choice(variants).format(**params)
@@ -0,0 +1,99 @@
+import hashlib
+import json
+from types import MappingProxyType
+from typing import Any
+from models import Question
+from .json_codec import dumps
+from .skip_rules import SkipRules
+from .validation import YES_NO_VALUES, ValidationResult, Validator, build_validator, is_date_of_birth
+
+
+def to_sheet_cell(value: Any) -> str:
+    """Format a response value for a spreadsheet cell."""
+    # Convert lists to comma-separated string for sheets
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)
+    return str(value)
+
+
+def question_schema(question: Question) -> dict:
+    """Client-side validation rules for a question (mirrors build_validator)."""
+    schema = {
+        "id": question.id,
+        "type": question.type.value,
+        "required": question.required,
+        "options": question.options,
+        "allow_other": question.allow_other,
+        "min": question.min_value,
+        "max": question.max_value,
+        "skip_when": [c.model_dump() for c in question.skip_when] if question.skip_when else None,
+    }
+    if question.type.value == "date":
+        schema["must_be_past"] = is_date_of_birth(question)
+    return schema
+
+
+class CompiledQuestionnaire:
+    """Read-only snapshot of a loaded question set.
+
+    Everything the per-answer path needs is derived once at load time: the
+    id -> index map, the question ids, the sheet header, a validator bound to
+    each question, the compiled skip rules, each question's JSON for
+    API responses and the serialized client-side validation schema. `version`
+    is a hash of the question definitions, which sessions are pinned to.
+    """
+
+    __slots__ = (
+        "questions", "version", "index_by_id", "ids", "header", "validators", "skip_rules",
+        "question_json", "schema_json", "schema_etag",
+    )
+
+    def __init__(self, questions: list[Question]):
+        self.questions: tuple[Question, ...] = tuple(questions)
+        self.version = hashlib.sha256(self.definitions().encode("utf-8")).hexdigest()[:16]
+        self.index_by_id = MappingProxyType({q.id: idx for idx, q in enumerate(self.questions)})
+        self.ids: tuple[str, ...] = tuple(q.id for q in self.questions)
+        self.header: tuple[str, ...] = tuple(q.text for q in self.questions)
+        self.validators: tuple[Validator, ...] = tuple(build_validator(q) for q in self.questions)
+        self.skip_rules = SkipRules(list(self.questions))
+        self.question_json: tuple[bytes, ...] = tuple(dumps(q.model_dump(mode="json")) for q in self.questions)
+
+        # Serialized once; the hash doubles as the schema version and ETag
+        schema = {
+            "questions": [question_schema(q) for q in self.questions],
+            "yes_no_values": sorted(YES_NO_VALUES),
+            "date_format": "YYYY-MM-DD",
+        }
+        self.schema_json = json.dumps(schema, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        self.schema_etag = hashlib.sha256(self.schema_json).hexdigest()[:16]
+
+    def definitions(self) -> str:
+        """The question definitions as JSON, which `version` is a hash of."""
+        return json.dumps([q.model_dump(mode="json") for q in self.questions], sort_keys=True)
+
+    @classmethod
+    def from_definitions(cls, data: str) -> "CompiledQuestionnaire":
+        """Rebuild a question set from `definitions` output."""
+        return cls([Question(**q) for q in json.loads(data)])
+
+    def question_by_id(self, question_id: str) -> Question | None:
+        idx = self.index_by_id.get(question_id)
+        return self.questions[idx] if idx is not None else None
+
+    def question_payload(self, question: Question) -> bytes:
+        """The question's JSON, serialized at load time if it belongs to this set."""
+        idx = self.index_by_id.get(question.id)
+        if idx is not None and self.questions[idx] is question:
+            return self.question_json[idx]
+        return dumps(question.model_dump(mode="json"))
+
+    def validate(self, index: int, value: Any) -> ValidationResult:
+        """Validate a response to the question at `index`."""
+        return self.validators[index](value)
+
+    def sheet_row(self, values: list[Any]) -> list[str]:
+        """Cells for answers by question position, blank for unanswered (None) questions."""
+        return ["" if value is None else to_sheet_cell(value) for value in values]
+
+    def __len__(self) -> int:
+        return len(self.questions)
@@ -0,0 +1,21 @@
+import json
+from typing import Any
+
+# orjson is optional: several times faster when installed (`pip install orjson`)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def with_raw_field(obj: dict, name: str, raw: bytes | None) -> bytes:
+    """JSON for `obj` plus a field whose value is already encoded (None = null)."""
+    body = dumps(obj)
+    return b"".join((body[:-1], b"," if obj else b"", dumps(name), b":", raw or b"null", b"}"))
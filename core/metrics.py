@@ -0,0 +1,283 @@
+import asyncio
+import bisect
+import threading
+import time
+from typing import Callable, Iterator
+
+# Latency buckets in seconds, from a fast validation to a slow AI call
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+INF_LABEL = 'le="+Inf"'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """A named metric with optional labels, rendered in the Prometheus text format."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self) -> Iterator[str]:
+        return iter(())
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        # Unlabelled counters are reported as 0 before the first increment
+        self._values: dict[tuple, float] = {} if labelnames else {(): 0}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Gauge(Metric):
+    """A value that goes up and down, either set directly or read from a function on scrape."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple, float] = {}
+        self._function: Callable[[], float] | None = None
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._function = function
+
+    def samples(self) -> Iterator[str]:
+        if self._function is not None:
+            yield f"{self.name} {_number(self._function())}"
+            return
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class _Timer:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child: "_HistogramChild"):
+        self.child = child
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        self.child.observe(time.perf_counter() - self.started)
+
+
+class _HistogramChild:
+    """Bucket counts of one label combination."""
+
+    __slots__ = ("buckets", "counts", "sum", "_lock")
+
+    def __init__(self, buckets: tuple[float, ...], lock: threading.Lock):
+        self.buckets = buckets
+        # One slot per bucket plus one for values above the largest bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = lock
+
+    def observe(self, value: float) -> None:
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        """Observe how long the `with` block takes."""
+        return _Timer(self)
+
+
+class Histogram(Metric):
+    """Latency histogram.
+
+    On hot paths, bind the labels once (`STAGE = HISTOGRAM.labels(stage="x")`)
+    and use `STAGE.time()` or `STAGE.observe()`.
+    """
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: dict[tuple, _HistogramChild] = {}
+
+    def labels(self, **labels) -> _HistogramChild:
+        key = self._key(labels)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, _HistogramChild(self.buckets, self._lock))
+        return child
+
+    def observe(self, value: float, **labels) -> None:
+        self.labels(**labels).observe(value)
+
+    def time(self, **labels) -> _Timer:
+        """Observe how long the `with` block takes."""
+        return _Timer(self.labels(**labels))
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = {
+                key: (list(child.counts), child.sum)
+                for key, child in self._children.items()
+            }
+        for key, (counts, sum_) in sorted(values.items()):
+            total = sum(counts)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_bucket{_labels(self.labelnames, key, INF_LABEL)} {total}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {repr(sum_)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {total}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "questionnaire_stage_seconds",
+    "Time spent in each stage of handling an answer",
+    ("stage",)
+))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    "http_request_seconds",
+    "API request latency until the response starts",
+    ("method", "path")
+))
+AI_SECONDS = REGISTRY.register(Histogram(
+    "ai_generate_seconds",
+    "Latency of AI generations per prompt kind, including cache hits",
+    ("kind",)
+))
+AI_FALLBACKS = REGISTRY.register(Counter(
+    "ai_fallbacks_total",
+    "AI generations that fell back to static text (error or latency budget)",
+    ("kind",)
+))
+AI_QUEUE_SECONDS = REGISTRY.register(Histogram(
+    "ai_queue_wait_seconds",
+    "Time model calls waited for the AI scheduler (concurrency and quota)",
+    ("kind",)
+))
+AI_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "ai_queue_depth",
+    "Model calls waiting for the AI scheduler"
+))
+AI_IN_FLIGHT = REGISTRY.register(Gauge(
+    "ai_in_flight",
+    "Model calls currently running"
+))
+AI_RATE_LIMITED = REGISTRY.register(Counter(
+    "ai_rate_limited_total",
+    "Model calls rejected with a 429 (quota exceeded)",
+    ("kind",)
+))
+VALIDATION_FAILURES = REGISTRY.register(Counter(
+    "validation_failures_total",
+    "Rejected answers by question type and failed rule",
+    ("question_type", "code")
+))
+SHEETS_SAVES = REGISTRY.register(Counter(
+    "sheets_saved_sessions_total",
+    "Sessions saved to Google Sheets"
+))
+SHEETS_SAVE_FAILURES = REGISTRY.register(Counter(
+    "sheets_save_failures_total",
+    "Failed Google Sheets batch saves (retried later)"
+))
+LOCAL_SAVES = REGISTRY.register(Counter(
+    "local_saved_sessions_total",
+    "Sessions saved to local response storage (exported to Sheets later)",
+    ("backend",)
+))
+SESSIONS_LIVE = REGISTRY.register(Gauge(
+    "sessions_live",
+    "Sessions currently held by the session backend"
+))
+SESSIONS_COMPLETED = REGISTRY.register(Counter(
+    "sessions_completed_total",
+    "Questionnaires completed"
+))
+STARTUP_SECONDS = REGISTRY.register(Gauge(
+    "startup_phase_seconds",
+    "Duration of each startup phase of this worker",
+    ("phase",)
+))
+EVENT_LOOP_LAG = REGISTRY.register(Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop woke up from a timed sleep",
+    buckets=LAG_BUCKETS
+))
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Sample event loop lag forever (run as a background task)."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(loop.time() - started - interval, 0))
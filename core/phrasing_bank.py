@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+from datetime import datetime
+from pathlib import Path
+from models import Question
+
+BANK_VERSION = 1
+
+
+def question_fingerprint(question: Question) -> str:
+    """Short hash of the question text a bank entry was generated from."""
+    return hashlib.sha256(question.text.encode("utf-8")).hexdigest()[:16]
+
+
+class PhrasingBank:
+    """Pre-generated conversational phrasings of each question.
+
+    The bank is built offline (see scripts/build_phrasing_bank.py) and stored
+    as a versioned JSON artifact:
+
+        {
+          "version": 1,
+          "built_at": "...",
+          "questions": {
+            "q1": {"fingerprint": "...", "phrasings": [...], "welcome": [...]}
+          }
+        }
+
+    Entries whose fingerprint no longer matches the live question text are
+    dropped on bind, so edited questions fall back to a live AI call.
+    """
+
+    def __init__(self, entries: dict[str, dict] | None = None, built_at: str | None = None):
+        self.entries: dict[str, dict] = entries or {}
+        self.built_at = built_at
+        self._phrasings: dict[str, list[str]] = {}
+        self._welcome: dict[str, list[str]] = {}
+
+    @classmethod
+    def load(cls, path: str | Path) -> "PhrasingBank":
+        """Load a bank artifact. Returns an empty bank if missing or invalid."""
+        path = Path(path)
+        if not path.exists():
+            return cls()
+
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Could not read phrasing bank {path}: {e}")
+            return cls()
+
+        if data.get("version") != BANK_VERSION:
+            print(f"Warning: Ignoring phrasing bank {path} with version {data.get('version')}")
+            return cls()
+
+        return cls(data.get("questions", {}), built_at=data.get("built_at"))
+
+    def save(self, path: str | Path) -> None:
+        """Write the bank artifact atomically."""
+        path = Path(path)
+        data = {
+            "version": BANK_VERSION,
+            "built_at": self.built_at or datetime.now().isoformat(),
+            "questions": self.entries,
+        }
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def bind(self, questions: list[Question]) -> int:
+        """Index phrasings for the live questions. Returns the number of stale entries."""
+        phrasings = {}
+        welcome = {}
+        stale = 0
+
+        for question in questions:
+            entry = self.entries.get(question.id)
+            if not entry:
+                continue
+            if entry.get("fingerprint") != question_fingerprint(question):
+                stale += 1
+                continue
+            if entry.get("phrasings"):
+                phrasings[question.id] = entry["phrasings"]
+            if entry.get("welcome"):
+                welcome[question.id] = entry["welcome"]
+
+        # Swap in whole, binding may run while requests are being served
+        self._phrasings = phrasings
+        self._welcome = welcome
+        return stale
+
+    def pick(self, question: Question, is_first: bool = False) -> str | None:
+        """Pick a random pre-generated phrasing, or None if the bank has none."""
+        variants = (self._welcome if is_first else self._phrasings).get(question.id)
+        if not variants:
+            return None
+        # Sessions pinned to an older question set may ask a different text under the same id
+        if self.entries[question.id].get("text", question.text) != question.text:
+            return None
+        return random.choice(variants)
+
+    def __len__(self) -> int:
+        return len(self._phrasings)
+
+
+async def build_phrasing_bank(questions: list[Question], ai_client, count: int) -> PhrasingBank:
+    """Generate `count` live rephrasings per question and collect them into a bank.
+
+    Rephrasings of one question are requested one after another, since
+    identical concurrent prompts would be coalesced into a single call.
+    """
+    async def rephrasings(question: Question) -> list[str]:
+        return [await ai_client.rephrase_question(question) for _ in range(count)]
+
+    all_results = await asyncio.gather(*(rephrasings(q) for q in questions))
+
+    entries = {}
+    for idx, (question, results) in enumerate(zip(questions, all_results)):
+        # Keep unique phrasings, preserving order
+        phrasings = list(dict.fromkeys(r for r in results if r))
+        if not phrasings:
+            print(f"Warning: No phrasings generated for {question.id}, it will use live calls")
+            continue
+
+        entry = {
+            "fingerprint": question_fingerprint(question),
+            "text": question.text,
+            "phrasings": phrasings,
+        }
+        if idx == 0:
+            entry["welcome"] = [f"Welcome! {p}" for p in phrasings]
+        entries[question.id] = entry
+
+    return PhrasingBank(entries, built_at=datetime.now().isoformat())
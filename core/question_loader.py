@@ -1,30 +1,119 @@
 import json
+import threading
+import time
 from pathlib import Path
 from config import settings
 from models import Question
+from .compiled import CompiledQuestionnaire
 
 
 class QuestionLoader:
+    """Loads the question set and keeps the versions sessions are pinned to.
+
+    `compiled` is the current version. `poll` does a cheap change check of
+    the source (file mtime and size, or a hash of the sheet's question
+    column) and only rebuilds the question set when it changed; the new
+    version is swapped in with a single assignment. Replaced versions are
+    kept until no session has used them for SESSION_TTL_SECONDS, so sessions
+    started on them can finish.
+    """
+
     def __init__(self):
         self.questions: list[Question] = []
+        self.compiled = CompiledQuestionnaire([])
+        # Replaced versions still in use: version -> (compiled, last used)
+        self._retired: dict[str, tuple[CompiledQuestionnaire, float]] = {}
+        self._revision: str | None = None
+        self._reload_lock = threading.Lock()
 
     def load(self) -> list[Question]:
-        """Load questions based on configured source."""
+        """Load questions based on configured source and compile them."""
+        self._revision = self._source_revision()
+        self.questions = self._read_questions()
+        self.compiled = CompiledQuestionnaire(self.questions)
+        return self.questions
+
+    def _read_questions(self) -> list[Question]:
         source = settings.QUESTION_SOURCE.lower()
 
         if source == "json":
-            self.questions = self._load_from_json()
+            return self._load_from_json()
         elif source == "sheets":
-            self.questions = self._load_from_sheets()
+            return self._load_from_sheets()
         elif source == "both":
             # Prefer JSON, fall back to sheets
-            self.questions = self._load_from_json()
-            if not self.questions:
-                self.questions = self._load_from_sheets()
-        else:
-            self.questions = self._load_from_json()
+            return self._load_from_json() or self._load_from_sheets()
+        return self._load_from_json()
 
-        return self.questions
+    def _source_revision(self) -> str | None:
+        """Cheap fingerprint of the question source, None if it can't be checked."""
+        source = settings.QUESTION_SOURCE.lower()
+        json_path = Path(settings.QUESTIONS_JSON_FILE)
+
+        if source != "sheets" and json_path.exists():
+            stat = json_path.stat()
+            return f"json:{stat.st_mtime_ns}:{stat.st_size}"
+        if source in ("sheets", "both"):
+            from storage.google_sheets import get_storage
+
+            try:
+                return f"sheets:{get_storage().questions_revision()}"
+            except Exception as e:
+                print(f"Warning: Could not check questions in Sheets: {e}")
+        return None
+
+    def poll(self) -> CompiledQuestionnaire | None:
+        """Reload the questions if the source changed. Returns the new version, if any."""
+        with self._reload_lock:
+            revision = self._source_revision()
+            if revision is None or revision == self._revision:
+                return None
+
+            try:
+                questions = self._read_questions()
+            except (OSError, ValueError) as e:
+                # e.g. the file is half written; try again on the next poll
+                print(f"Warning: Could not reload questions: {e}")
+                return None
+            if not questions:
+                print("Warning: Reloaded question set is empty, keeping the current one")
+                return None
+
+            self._revision = revision
+            compiled = CompiledQuestionnaire(questions)
+            if compiled.version == self.compiled.version:
+                return None
+
+            now = time.monotonic()
+            self._retired = {
+                version: (old, last_used)
+                for version, (old, last_used) in self._retired.items()
+                if now - last_used < settings.SESSION_TTL_SECONDS and version != compiled.version
+            }
+            self._retired[self.compiled.version] = (self.compiled, now)
+            self.questions = questions
+            self.compiled = compiled
+            return compiled
+
+    def get_version(self, version: str | None) -> CompiledQuestionnaire | None:
+        """The question set a session is pinned to, None if this worker doesn't have it."""
+        if not version or version == self.compiled.version:
+            return self.compiled
+        retired = self._retired.get(version)
+        if not retired:
+            return None
+        # Sessions still use it, so keep it past the next reload
+        self._retired[version] = (retired[0], time.monotonic())
+        return retired[0]
+
+    def add_version(self, compiled: CompiledQuestionnaire) -> None:
+        """Keep a question set loaded from elsewhere (e.g. stored by another worker)."""
+        if compiled.version != self.compiled.version:
+            self._retired[compiled.version] = (compiled, time.monotonic())
+
+    def versions(self) -> list[CompiledQuestionnaire]:
+        """The current version followed by the retired ones still kept."""
+        return [self.compiled] + [compiled for compiled, _ in self._retired.values()]
 
     def _load_from_json(self) -> list[Question]:
         """Load questions from JSON file."""
@@ -43,28 +132,10 @@ class QuestionLoader:
 
     def _load_from_sheets(self) -> list[Question]:
         """Load questions from Google Sheets."""
-        from storage.google_sheets import GoogleSheetsStorage
+        from storage.google_sheets import get_storage
 
         try:
-            sheets = GoogleSheetsStorage()
-            return sheets.load_questions()
+            return get_storage().load_questions()
         except Exception as e:
             print(f"Failed to load questions from Sheets: {e}")
             return []
-
-    def get_question(self, index: int) -> Question | None:
-        """Get question by index."""
-        if 0 <= index < len(self.questions):
-            return self.questions[index]
-        return None
-
-    def get_question_by_id(self, question_id: str) -> Question | None:
-        """Get question by ID."""
-        for q in self.questions:
-            if q.id == question_id:
-                return q
-        return None
-
-    @property
-    def total_questions(self) -> int:
-        return len(self.questions)
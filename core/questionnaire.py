@@ -1,81 +1,143 @@
 import uuid
 from datetime import datetime
-from models import Question, SessionState, UserResponse, AIMessage, SkipCondition
+from typing import Any, AsyncIterator, Awaitable, Callable
+from config import settings
+from models import Question, AIMessage
 from .ai_client import AIClient
+from .clarification import ClarificationEngine
+from .compiled import CompiledQuestionnaire
+from .metrics import SESSIONS_COMPLETED, STAGE_SECONDS, VALIDATION_FAILURES
+from .phrasing_bank import PhrasingBank
 from .question_loader import QuestionLoader
+from .session import SessionState
+from .session_store import create_session_backend
+
+# Bound once: these are timed several times per answer
+VALIDATE_STAGE = STAGE_SECONDS.labels(stage="validate")
+CLARIFY_STAGE = STAGE_SECONDS.labels(stage="clarify")
+APPRECIATE_STAGE = STAGE_SECONDS.labels(stage="appreciate")
+ADVANCE_STAGE = STAGE_SECONDS.labels(stage="advance")
+SESSION_SAVE_STAGE = STAGE_SECONDS.labels(stage="session_save")
+PRESENT_STAGE = STAGE_SECONDS.labels(stage="present")
+COMPLETE_STAGE = STAGE_SECONDS.labels(stage="complete")
 
 
 class Questionnaire:
     def __init__(self):
         self.ai_client = AIClient()
+        self.clarifier = ClarificationEngine()
         self.question_loader = QuestionLoader()
-        self.sessions: dict[str, SessionState] = {}
-
-    def _should_skip(self, question: Question, session: SessionState) -> bool:
-        """Check if a question should be skipped based on previous answers."""
-        if not question.skip_when:
-            return False
-
-        response_map = {r.question_id: r.value for r in session.responses}
+        self.sessions = create_session_backend()
 
-        for condition in question.skip_when:
-            ref_value = response_map.get(condition.question_id)
-            if ref_value is None:
-                continue
+    def _compiled(self, session: SessionState) -> CompiledQuestionnaire:
+        """The question set version the session is pinned to."""
+        compiled = self.question_loader.get_version(session.questions_version)
+        if compiled is None:
+            raise ValueError("Session not found")
+        return compiled
 
-            match condition.operator:
-                case "equals":
-                    if ref_value == condition.value:
-                        return True
-                case "not_equals":
-                    if ref_value != condition.value:
-                        return True
-                case "contains":
-                    if isinstance(ref_value, list) and condition.value in ref_value:
-                        return True
-                case "not_contains":
-                    if isinstance(ref_value, list) and condition.value not in ref_value:
-                        return True
-
-        return False
+    def _record_response(self, session: SessionState, index: int, value: any) -> None:
+        """Record a response and update the skip state of questions that depend on it."""
+        session.record(index, value)
+        self._compiled(session).skip_rules.update(index, session.values, session.skipped)
 
     def _next_question(self, session: SessionState) -> Question | None:
         """Get the next non-skipped question from the current index.
         Skipped questions get an N/A response for consistency."""
-        while session.current_question_index < self.question_loader.total_questions:
-            question = self.question_loader.get_question(session.current_question_index)
-            if question and self._should_skip(question, session):
-                session.responses.append(UserResponse(
-                    question_id=question.id,
-                    value="N/A",
-                    timestamp=datetime.now().isoformat()
-                ))
+        questions = self._compiled(session).questions
+        while session.current_question_index < len(questions):
+            question = questions[session.current_question_index]
+            if session.skipped[session.current_question_index]:
+                self._record_response(session, session.current_question_index, "N/A")
                 session.current_question_index += 1
                 continue
             return question
         return None
 
     def initialize(self) -> None:
-        """Load questions on startup."""
-        self.question_loader.load()
+        """Load questions and the pre-generated phrasing bank on startup."""
+        questions = self.question_loader.load()
+        self._store_question_set(self.question_loader.compiled)
+
+        bank = PhrasingBank.load(settings.PHRASING_BANK_FILE)
+        stale = bank.bind(questions)
+        if stale:
+            print(f"Warning: {stale} question(s) changed since the phrasing bank was built, using live AI for them")
+        self.ai_client.phrasing_bank = bank
+
+    def reload_questions(self) -> bool:
+        """Swap in edited questions, if the source changed. Returns True on reload.
+
+        New sessions get the new version; existing ones keep theirs.
+        """
+        compiled = self.question_loader.poll()
+        if not compiled:
+            return False
+        self._store_question_set(compiled)
+
+        if self.ai_client.phrasing_bank:
+            stale = self.ai_client.phrasing_bank.bind(list(compiled.questions))
+            if stale:
+                print(f"Warning: {stale} question(s) changed since the phrasing bank was built, using live AI for them")
+        print(f"Reloaded questions: version {compiled.version} with {len(compiled)} question(s)")
+        return True
+
+    def _store_question_set(self, compiled: CompiledQuestionnaire) -> None:
+        """Store the question set with the sessions, for workers that restart or haven't loaded it."""
+        if compiled.questions:
+            self.sessions.save_question_set(compiled.version, compiled.definitions())
+
+    async def _restore_question_set(self, version: str) -> CompiledQuestionnaire | None:
+        """Load a question set stored by another worker, or by this one before a restart."""
+        data = await self.sessions.aload_question_set(version)
+        if data is None:
+            return None
+        compiled = CompiledQuestionnaire.from_definitions(data)
+        if compiled.version != version:
+            print(f"Warning: Stored question set {version} doesn't match its version")
+            return None
+        self.question_loader.add_version(compiled)
+        return compiled
 
-    def create_session(self) -> str:
+    async def create_session(self) -> SessionState:
         """Create a new questionnaire session."""
-        session_id = str(uuid.uuid4())
-        self.sessions[session_id] = SessionState(session_id=session_id)
-        return session_id
+        compiled = self.question_loader.compiled
+        session = SessionState(str(uuid.uuid4()), questions_version=compiled.version, size=len(compiled))
+        await self.sessions.aadd(session)
+        return session
 
-    def get_session(self, session_id: str) -> SessionState | None:
-        """Get session state by ID."""
-        return self.sessions.get(session_id)
+    def get_compiled(self, session: SessionState | None = None) -> CompiledQuestionnaire:
+        """The question set version a session is pinned to (the current one if none or unknown)."""
+        loader = self.question_loader
+        if session is None:
+            return loader.compiled
+        return loader.get_version(session.questions_version) or loader.compiled
 
-    async def start_session(self, session_id: str) -> AIMessage:
-        """Start a session and present the first question."""
-        session = self.get_session(session_id)
-        if not session:
-            raise ValueError("Session not found")
+    async def get_session(self, session_id: str) -> SessionState | None:
+        """Get session state by ID.
+
+        Fetch it once per request and pass it to the methods below.
+
+        A question set this worker doesn't have (one edited in but not yet
+        polled here, or retired before a restart) is loaded from the session
+        backend. If it isn't stored there either, the session counts as
+        expired: its answers are stored by position and can't be read
+        against another set.
+        """
+        session = await self.sessions.aget(session_id)
+        if (
+            session
+            and self.question_loader.get_version(session.questions_version) is None
+            and await self._restore_question_set(session.questions_version) is None
+        ):
+            print(f"Warning: Session {session_id} is pinned to unknown question set {session.questions_version}")
+            return None
+        return session
 
-        question = self.question_loader.get_question(0)
+    async def start_session(self, session: SessionState) -> AIMessage:
+        """Start a session and present the first question."""
+        questions = self._compiled(session).questions
+        question = questions[0] if questions else None
         if not question:
             return AIMessage(
                 message="No questions configured. Please add questions to start.",
@@ -90,50 +152,127 @@ class Questionnaire:
             is_complete=False
         )
 
-    async def process_response(self, session_id: str, value: any) -> AIMessage:
-        """Process user response and return next question or completion."""
-        session = self.get_session(session_id)
-        if not session:
-            raise ValueError("Session not found")
+    async def _submit(self, session: SessionState, value: any) -> tuple[AIMessage | None, str, Question | None]:
+        """Validate and record a response.
 
-        current_question = self.question_loader.get_question(session.current_question_index)
-        if not current_question:
-            return AIMessage(message="No current question", is_complete=True)
+        Returns (reply, appreciation, next_question). `reply` is set instead
+        when there is nothing to advance to or the response needs clarification.
+        """
+        compiled = self._compiled(session)
+        if session.current_question_index >= len(compiled):
+            return AIMessage(message="No current question", is_complete=True), "", None
+        current_question = compiled.questions[session.current_question_index]
 
         # Validate the response
-        is_valid, error_msg = self.ai_client.validate_response(current_question, value)
+        with VALIDATE_STAGE.time():
+            result = compiled.validate(session.current_question_index, value)
 
-        if not is_valid:
-            # Request clarification
-            clarification = await self.ai_client.request_clarification(
-                current_question, str(value)
-            )
+        if not result.is_valid:
+            VALIDATION_FAILURES.inc(question_type=current_question.type.value, code=result.code)
+            # Request clarification, from a template when one covers the failure
+            with CLARIFY_STAGE.time():
+                clarification = self.clarifier.clarify(current_question, result)
+                if not clarification:
+                    clarification = await self.ai_client.request_clarification(
+                        current_question, str(value), reason=result.message
+                    )
             session.awaiting_clarification = True
+            await self.sessions.asave(session)
             return AIMessage(
                 message=clarification,
                 question=current_question,
                 is_complete=False,
                 needs_clarification=True
-            )
+            ), "", None
 
         # Save the response
-        session.responses.append(UserResponse(
-            question_id=current_question.id,
-            value=value,
-            timestamp=datetime.now().isoformat()
-        ))
+        self._record_response(session, session.current_question_index, value)
         session.awaiting_clarification = False
 
         # Generate appreciation
-        appreciation = await self.ai_client.appreciate_response(current_question, str(value))
+        with APPRECIATE_STAGE.time():
+            appreciation = await self.ai_client.appreciate_response(current_question, str(value))
 
         # Move to next question (skipping conditional ones)
-        session.current_question_index += 1
-        next_question = self._next_question(session)
+        with ADVANCE_STAGE.time():
+            session.current_question_index += 1
+            next_question = self._next_question(session)
+        if not next_question:
+            session.completed = True
+            SESSIONS_COMPLETED.inc()
+        with SESSION_SAVE_STAGE.time():
+            await self.sessions.asave(session)
+
+        return None, appreciation, next_question
+
+    async def submit_batch(self, session: SessionState, answers: dict[str, Any]) -> dict[str, str]:
+        """Validate and record answers to all remaining questions in one pass.
+
+        Skip conditions are evaluated in question order as the chat flow
+        would, and skipped questions get an N/A response. Nothing is recorded
+        unless every answer is valid; returns {question_id: error} otherwise.
+        """
+        if session.completed:
+            raise ValueError("Session already completed")
+
+        compiled = self._compiled(session)
+        start = session.current_question_index
+        remaining = compiled.questions[start:]
+        open_ids = {q.id for q in remaining}
+        errors = {
+            question_id: "Not an open question in this session"
+            for question_id in answers if question_id not in open_ids
+        }
+
+        # Work on copies so a rejected batch leaves the session untouched
+        tentative = list(session.values)
+        skipped = bytearray(session.skipped)
+        accepted = []
+        for idx, question in enumerate(remaining, start):
+            if skipped[idx]:
+                value = "N/A"
+            else:
+                value = answers.get(question.id, "")
+                result = compiled.validate(idx, value)
+                if not result.is_valid:
+                    VALIDATION_FAILURES.inc(question_type=question.type.value, code=result.code)
+                    errors[question.id] = result.message
+                    continue
+            tentative[idx] = value
+            compiled.skip_rules.update(idx, tentative, skipped)
+            accepted.append((idx, value))
+
+        if errors:
+            return errors
+
+        for idx, value in accepted:
+            self._record_response(session, idx, value)
+        session.current_question_index = len(compiled)
+        session.awaiting_clarification = False
+        session.completed = True
+        SESSIONS_COMPLETED.inc()
+        await self.sessions.asave(session)
+        return {}
+
+    async def process_response(
+        self,
+        session: SessionState,
+        value: any,
+        on_complete: Callable[[SessionState], Awaitable[None]] | None = None
+    ) -> AIMessage:
+        """Process user response and return next question or completion.
+
+        `on_complete(session)` is awaited as soon as the response completes
+        the session, before the closing message is generated.
+        """
+        reply, appreciation, next_question = await self._submit(session, value)
+        if reply:
+            return reply
 
         if next_question:
             # Present next question
-            next_message = await self.ai_client.present_question(next_question)
+            with PRESENT_STAGE.time():
+                next_message = await self.ai_client.present_question(next_question)
             return AIMessage(
                 message=f"{appreciation} {next_message}",
                 question=next_question,
@@ -141,51 +280,88 @@ class Questionnaire:
             )
         else:
             # All questions completed
-            session.completed = True
-            completion = await self.ai_client.completion_message()
+            if on_complete:
+                await on_complete(session)
+            with COMPLETE_STAGE.time():
+                completion = await self.ai_client.completion_message()
             return AIMessage(
                 message=f"{appreciation} {completion}",
                 is_complete=True
             )
 
-    def get_all_responses(self, session_id: str) -> list[dict]:
-        """Get all responses for a session with question info."""
-        session = self.get_session(session_id)
-        if not session:
-            return []
+    async def process_response_stream(
+        self,
+        session: SessionState,
+        value: any,
+        on_complete: Callable[[SessionState], Awaitable[None]] | None = None
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """Process user response, streaming the reply as it is generated.
+
+        Yields ("message", text) with the appreciation as soon as the answer
+        is recorded, then ("delta", text) chunks of the next question's
+        phrasing (or the completion message), and finally ("final", AIMessage)
+        with the complete reply. `on_complete` is awaited as in
+        `process_response`, before anything is yielded.
+        """
+        reply, appreciation, next_question = await self._submit(session, value)
+        if reply:
+            yield "final", reply
+            return
+        if not next_question and on_complete:
+            await on_complete(session)
+
+        yield "message", appreciation
+
+        if next_question:
+            deltas = []
+            with PRESENT_STAGE.time():
+                async for delta in self.ai_client.stream_present_question(next_question):
+                    yield "delta", delta if deltas else f" {delta}"
+                    deltas.append(delta)
+
+            if deltas:
+                next_message = self.ai_client.clean_phrasing("".join(deltas), next_question)
+            else:
+                next_message = next_question.text
+            yield "final", AIMessage(
+                message=f"{appreciation} {next_message}",
+                question=next_question,
+                is_complete=False
+            )
+        else:
+            with COMPLETE_STAGE.time():
+                completion = await self.ai_client.completion_message()
+            yield "delta", f" {completion}"
+            yield "final", AIMessage(
+                message=f"{appreciation} {completion}",
+                is_complete=True
+            )
 
+    def get_all_responses(self, session: SessionState) -> list[dict]:
+        """Get all responses for a session with question info."""
+        questions = self._compiled(session).questions
         results = []
-        for response in session.responses:
-            question = self.question_loader.get_question_by_id(response.question_id)
+        for idx, answered_at in enumerate(session.answered_at):
+            if not answered_at:
+                continue
             results.append({
-                "question_id": response.question_id,
-                "question_text": question.text if question else "Unknown",
-                "response": response.value,
-                "timestamp": response.timestamp
+                "question_id": questions[idx].id,
+                "question_text": questions[idx].text,
+                "response": session.values[idx],
+                "timestamp": datetime.fromtimestamp(answered_at).isoformat()
             })
 
         return results
 
-    def get_questions_for_sheet_header(self) -> list[str]:
-        """Get question texts for sheet header row."""
-        return [q.text for q in self.question_loader.questions]
+    def get_questions_for_sheet_header(self, session: SessionState | None = None) -> list[str]:
+        """Get question texts for sheet header row (of the session's question set, if given)."""
+        return list(self.get_compiled(session).header)
 
-    def get_responses_for_sheet_row(self, session_id: str) -> list[str]:
-        """Get responses in order for sheet row."""
-        session = self.get_session(session_id)
-        if not session:
-            return []
-
-        # Create a mapping of question_id to response value
-        response_map = {r.question_id: r.value for r in session.responses}
+    def get_question_ids_for_sheet(self, session: SessionState | None = None) -> list[str]:
+        """Get question ids in sheet order (of the session's question set, if given)."""
+        return list(self.get_compiled(session).ids)
 
+    def get_responses_for_sheet_row(self, session: SessionState) -> list[str]:
+        """Get responses in order for sheet row."""
         # Return values in question order
-        row = []
-        for question in self.question_loader.questions:
-            value = response_map.get(question.id, "")
-            # Convert lists to comma-separated string for sheets
-            if isinstance(value, list):
-                value = ", ".join(str(v) for v in value)
-            row.append(str(value))
-
-        return row
+        return self._compiled(session).sheet_row(session.values)
@@ -0,0 +1,70 @@
+import json
+import time
+from array import array
+from typing import Any
+
+
+class SessionState:
+    """A questionnaire session, stored compactly.
+
+    Answers are kept in slot arrays indexed by question position in the
+    session's question set: `values` holds the answer (None when
+    unanswered), `answered_at` the epoch second it was recorded (0 when
+    unanswered) and `skipped` a flag per question whose skip conditions
+    currently match. Response dicts for the API are built from these on
+    demand.
+    """
+
+    __slots__ = (
+        "session_id", "questions_version", "current_question_index", "values", "answered_at", "skipped",
+        "completed", "awaiting_clarification",
+    )
+
+    def __init__(self, session_id: str, questions_version: str = "", size: int = 0):
+        self.session_id = session_id
+        self.questions_version = questions_version  # Question set version the session is pinned to
+        self.current_question_index = 0
+        self.values: list[Any] = [None] * size
+        self.answered_at = array("q", bytes(8 * size))
+        self.skipped = bytearray(size)
+        self.completed = False
+        self.awaiting_clarification = False
+
+    def record(self, index: int, value: Any) -> None:
+        """Record the answer to the question at `index`."""
+        self.values[index] = value
+        self.answered_at[index] = int(time.time())
+
+    @property
+    def response_count(self) -> int:
+        return len(self.answered_at) - self.answered_at.count(0)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "session_id": self.session_id,
+            "questions_version": self.questions_version,
+            "current_question_index": self.current_question_index,
+            "values": self.values,
+            "answered_at": self.answered_at.tolist(),
+            "skipped": [i for i, flag in enumerate(self.skipped) if flag],
+            "completed": self.completed,
+            "awaiting_clarification": self.awaiting_clarification,
+        }, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str | bytes) -> "SessionState":
+        """Rebuild a session from `to_json` output. Raises ValueError on other data."""
+        try:
+            fields = json.loads(data)
+            session = cls(fields["session_id"], fields["questions_version"])
+            session.current_question_index = fields["current_question_index"]
+            session.values = fields["values"]
+            session.answered_at = array("q", fields["answered_at"])
+            session.skipped = bytearray(len(session.values))
+            for i in fields["skipped"]:
+                session.skipped[i] = 1
+            session.completed = fields["completed"]
+            session.awaiting_clarification = fields["awaiting_clarification"]
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Not a stored session: {e}") from e
+        return session
@@ -0,0 +1,495 @@
+import asyncio
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from itertools import islice
+from config import settings
+from .session import SessionState
+
+# Number of sessions measured when estimating memory use
+SIZE_SAMPLE = 50
+
+
+def _deep_sizeof(obj, seen: set[int] | None = None) -> int:
+    """Approximate memory footprint of an object graph in bytes."""
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += _deep_sizeof(obj.__dict__, seen)
+    elif hasattr(type(obj), "__slots__"):
+        size += sum(_deep_sizeof(getattr(obj, name), seen) for name in type(obj).__slots__ if hasattr(obj, name))
+    return size
+
+
+def _load_session(data: str | bytes) -> SessionState | None:
+    """Decode a stored session; sessions in an older format count as gone."""
+    try:
+        return SessionState.from_json(data)
+    except ValueError:
+        return None
+
+
+class SessionBackend(ABC):
+    """Where questionnaire sessions live.
+
+    `get` returns a session the caller may mutate; mutations are only
+    guaranteed to be visible to other workers after `save`. Async code uses
+    the `a`-prefixed variants, which run backends that do I/O (`blocking`)
+    in a worker thread so they don't stall the event loop.
+    """
+
+    blocking = True
+
+    def __init__(self, ttl_seconds: float = 3600, max_sessions: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.evicted = {"expired": 0, "lru": 0, "offloaded": 0}
+
+    @abstractmethod
+    def add(self, session: SessionState) -> None:
+        """Add a new session, evicting the least recently used if full."""
+
+    @abstractmethod
+    def get(self, session_id: str) -> SessionState | None:
+        """Get a live session and mark it as recently used."""
+
+    @abstractmethod
+    def save(self, session: SessionState) -> None:
+        """Persist changes made to a session."""
+
+    @abstractmethod
+    def offload(self, session: SessionState) -> None:
+        """Drop a completed session once its responses are persisted.
+
+        A small record of the completion is kept for the TTL, so status
+        checks and retried final answers still see the session as completed.
+        """
+
+    @abstractmethod
+    def get_completed(self, session_id: str) -> tuple[int, int] | None:
+        """(total questions, response count) of an offloaded session, None if unknown or expired."""
+
+    def save_question_set(self, version: str, data: str) -> None:
+        """Store a question set's definitions, so workers that lack it can load it."""
+
+    def load_question_set(self, version: str) -> str | None:
+        """Definitions stored by `save_question_set`, None if unknown."""
+        return None
+
+    @abstractmethod
+    def prune(self) -> int:
+        """Remove sessions idle for longer than the TTL. Returns the number removed."""
+
+    @abstractmethod
+    def approx_bytes(self) -> int:
+        """Estimate the memory or storage held by live sessions."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    async def _run(self, method, *args):
+        if self.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def aadd(self, session: SessionState) -> None:
+        await self._run(self.add, session)
+
+    async def aget(self, session_id: str) -> SessionState | None:
+        return await self._run(self.get, session_id)
+
+    async def asave(self, session: SessionState) -> None:
+        await self._run(self.save, session)
+
+    async def aoffload(self, session: SessionState) -> None:
+        await self._run(self.offload, session)
+
+    async def aget_completed(self, session_id: str) -> tuple[int, int] | None:
+        return await self._run(self.get_completed, session_id)
+
+    async def aload_question_set(self, version: str) -> str | None:
+        return await self._run(self.load_question_set, version)
+
+    async def astats(self) -> dict:
+        return await self._run(self.stats)
+
+    def stats(self) -> dict:
+        """Live session count, estimated size and eviction counters."""
+        return {
+            "backend": self.name,
+            "live": len(self),
+            "approx_bytes": self.approx_bytes(),
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl_seconds,
+            "evicted": dict(self.evicted),
+        }
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+
+class MemorySessionBackend(SessionBackend):
+    """In-process session store with an idle TTL and an LRU size cap.
+
+    Sessions are kept in least-recently-used order, so expiring idle
+    sessions only touches the ones that actually expired, and the oldest
+    session is evicted first when the cap is reached. Only usable with a
+    single worker process, which already holds every question set its
+    sessions are pinned to.
+    """
+
+    name = "memory"
+    blocking = False
+
+    def __init__(self, ttl_seconds: float = 3600, max_sessions: int = 10000):
+        super().__init__(ttl_seconds, max_sessions)
+        self._sessions: OrderedDict[str, tuple[SessionState, float]] = OrderedDict()
+        # Offloaded sessions: id -> (total questions, response count, offloaded at), oldest first
+        self._completed: OrderedDict[str, tuple[int, int, float]] = OrderedDict()
+
+    def add(self, session: SessionState) -> None:
+        self.prune()
+        self._sessions[session.session_id] = (session, time.monotonic())
+        self._sessions.move_to_end(session.session_id)
+
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted["lru"] += 1
+
+    def get(self, session_id: str) -> SessionState | None:
+        item = self._sessions.get(session_id)
+        if not item:
+            return None
+
+        session, last_seen = item
+        now = time.monotonic()
+        if now - last_seen > self.ttl_seconds:
+            del self._sessions[session_id]
+            self.evicted["expired"] += 1
+            return None
+
+        self._sessions[session_id] = (session, now)
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def save(self, session: SessionState) -> None:
+        # Sessions are mutated in place
+        pass
+
+    def offload(self, session: SessionState) -> None:
+        if self._sessions.pop(session.session_id, None):
+            self.evicted["offloaded"] += 1
+        self._completed[session.session_id] = (len(session.values), session.response_count, time.monotonic())
+        self._completed.move_to_end(session.session_id)
+        if len(self._completed) > self.max_sessions:
+            self._completed.popitem(last=False)
+
+    def get_completed(self, session_id: str) -> tuple[int, int] | None:
+        item = self._completed.get(session_id)
+        if not item or time.monotonic() - item[2] > self.ttl_seconds:
+            return None
+        return item[:2]
+
+    def prune(self) -> int:
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._completed and next(iter(self._completed.values()))[2] <= cutoff:
+            self._completed.popitem(last=False)
+
+        removed = 0
+        while self._sessions:
+            session_id, (_, last_seen) = next(iter(self._sessions.items()))
+            if last_seen > cutoff:
+                break
+            del self._sessions[session_id]
+            removed += 1
+
+        self.evicted["expired"] += removed
+        return removed
+
+    def approx_bytes(self) -> int:
+        # Measure a sample of recent sessions and extrapolate
+        if not self._sessions:
+            return 0
+        sample = [session for session, _ in islice(reversed(self._sessions.values()), SIZE_SAMPLE)]
+        per_session = sum(_deep_sizeof(s) for s in sample) / len(sample)
+        return int(per_session * len(self._sessions))
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """Sessions in a local SQLite database in WAL mode.
+
+    Shared by every worker process on the same host. Sessions are stored
+    as JSON and the idle TTL and size cap are enforced by `prune`, which
+    `add` runs every `prune_every` inserts.
+    """
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        path: str,
+        ttl_seconds: float = 3600,
+        max_sessions: int = 10000,
+        prune_every: int = 100
+    ):
+        super().__init__(ttl_seconds, max_sessions)
+        self.path = path
+        self.prune_every = prune_every
+        self._adds = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, last_seen REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS completed_sessions ("
+            "session_id TEXT PRIMARY KEY, total INTEGER NOT NULL, responses INTEGER NOT NULL, "
+            "completed_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS question_sets (version TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+
+    def add(self, session: SessionState) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)",
+                (session.session_id, session.to_json(), time.time())
+            )
+            self._adds += 1
+        if self._adds % self.prune_every == 0:
+            self.prune()
+
+    def get(self, session_id: str) -> SessionState | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, last_seen FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if not row:
+                return None
+
+            data, last_seen = row
+            now = time.time()
+            if now - last_seen > self.ttl_seconds:
+                self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+                self.evicted["expired"] += 1
+                return None
+
+            self._db.execute(
+                "UPDATE sessions SET last_seen = ? WHERE session_id = ?", (now, session_id)
+            )
+        return _load_session(data)
+
+    def save(self, session: SessionState) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE sessions SET data = ?, last_seen = ? WHERE session_id = ?",
+                (session.to_json(), time.time(), session.session_id)
+            )
+
+    def offload(self, session: SessionState) -> None:
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session.session_id,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO completed_sessions VALUES (?, ?, ?, ?)",
+                (session.session_id, len(session.values), session.response_count, time.time())
+            )
+        if cursor.rowcount:
+            self.evicted["offloaded"] += 1
+
+    def get_completed(self, session_id: str) -> tuple[int, int] | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT total, responses FROM completed_sessions WHERE session_id = ? AND completed_at >= ?",
+                (session_id, time.time() - self.ttl_seconds)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def save_question_set(self, version: str, data: str) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR IGNORE INTO question_sets VALUES (?, ?)", (version, data))
+
+    def load_question_set(self, version: str) -> str | None:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM question_sets WHERE version = ?", (version,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def prune(self) -> int:
+        with self._lock:
+            cutoff = time.time() - self.ttl_seconds
+            expired = self._db.execute("DELETE FROM sessions WHERE last_seen < ?", (cutoff,)).rowcount
+            self._db.execute("DELETE FROM completed_sessions WHERE completed_at < ?", (cutoff,))
+            # Keep only the most recently used max_sessions rows
+            over_cap = self._db.execute(
+                "DELETE FROM sessions WHERE session_id IN ("
+                "SELECT session_id FROM sessions ORDER BY last_seen DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,)
+            ).rowcount
+
+        self.evicted["expired"] += expired
+        self.evicted["lru"] += over_cap
+        return expired
+
+    def approx_bytes(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM sessions").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+class RedisSessionBackend(SessionBackend):
+    """Sessions in Redis (or anything speaking the Redis protocol).
+
+    Shared by every worker and instance pointing at the same server. Each
+    session is a JSON string with the idle TTL as its expiry, and a sorted
+    set of last-use times enforces the size cap. Pass `client` to use an
+    existing connection or a local stand-in.
+    """
+
+    name = "redis"
+
+    def __init__(
+        self,
+        url: str = "",
+        ttl_seconds: float = 3600,
+        max_sessions: int = 10000,
+        prefix: str = "questionnaire:",
+        client=None
+    ):
+        super().__init__(ttl_seconds, max_sessions)
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError(
+                    "SESSION_BACKEND=redis needs the redis package: "
+                    "install the project with the 'redis' extra (uv sync --extra redis)"
+                ) from e
+            client = redis.Redis.from_url(url)
+        self.redis = client
+        self.prefix = prefix
+        self._index_key = f"{prefix}sessions"
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}session:{session_id}"
+
+    def save_question_set(self, version: str, data: str) -> None:
+        self.redis.set(f"{self.prefix}questions:{version}", data, nx=True)
+
+    def load_question_set(self, version: str) -> str | None:
+        data = self.redis.get(f"{self.prefix}questions:{version}")
+        return self._decode(data) if data is not None else None
+
+    def add(self, session: SessionState) -> None:
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.set(self._key(session.session_id), session.to_json(), ex=int(self.ttl_seconds))
+        pipe.zadd(self._index_key, {session.session_id: now})
+        pipe.zremrangebyscore(self._index_key, "-inf", now - self.ttl_seconds)
+        pipe.zcard(self._index_key)
+        live = pipe.execute()[-1]
+
+        if live > self.max_sessions:
+            # Evict the least recently used sessions past the cap
+            oldest = self.redis.zpopmin(self._index_key, live - self.max_sessions)
+            if oldest:
+                self.redis.delete(*(self._key(self._decode(sid)) for sid, _ in oldest))
+                self.evicted["lru"] += len(oldest)
+
+    def get(self, session_id: str) -> SessionState | None:
+        # One round trip: refresh the expiry and the last-use time together
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.getex(self._key(session_id), ex=int(self.ttl_seconds))
+        pipe.zadd(self._index_key, {session_id: time.time()}, xx=True)
+        data = pipe.execute()[0]
+        if data is None:
+            # Expired; drop it from the index the lookup just refreshed
+            self.redis.zrem(self._index_key, session_id)
+            return None
+        return _load_session(data)
+
+    def save(self, session: SessionState) -> None:
+        pipe = self.redis.pipeline()
+        pipe.set(self._key(session.session_id), session.to_json(), ex=int(self.ttl_seconds), xx=True)
+        pipe.zadd(self._index_key, {session.session_id: time.time()}, xx=True)
+        pipe.execute()
+
+    def offload(self, session: SessionState) -> None:
+        pipe = self.redis.pipeline()
+        pipe.delete(self._key(session.session_id))
+        pipe.zrem(self._index_key, session.session_id)
+        pipe.set(
+            f"{self.prefix}completed:{session.session_id}",
+            f"{len(session.values)},{session.response_count}",
+            ex=int(self.ttl_seconds)
+        )
+        if pipe.execute()[0]:
+            self.evicted["offloaded"] += 1
+
+    def get_completed(self, session_id: str) -> tuple[int, int] | None:
+        data = self.redis.get(f"{self.prefix}completed:{session_id}")
+        if data is None:
+            return None
+        total, responses = self._decode(data).split(",")
+        return int(total), int(responses)
+
+    def prune(self) -> int:
+        # Session keys expire on their own; only the index needs trimming
+        removed = self.redis.zremrangebyscore(self._index_key, "-inf", time.time() - self.ttl_seconds)
+        self.evicted["expired"] += removed
+        return removed
+
+    def approx_bytes(self) -> int:
+        # Measure a sample of recent sessions and extrapolate
+        recent = self.redis.zrevrange(self._index_key, 0, SIZE_SAMPLE - 1)
+        if not recent:
+            return 0
+        pipe = self.redis.pipeline()
+        for sid in recent:
+            pipe.strlen(self._key(self._decode(sid)))
+        sizes = pipe.execute()
+        return int(sum(sizes) / len(sizes) * len(self))
+
+    def __len__(self) -> int:
+        return self.redis.zcard(self._index_key)
+
+    @staticmethod
+    def _decode(value: bytes | str) -> str:
+        return value.decode() if isinstance(value, bytes) else value
+
+
+def create_session_backend() -> SessionBackend:
+    """Build the session backend selected by SESSION_BACKEND."""
+    backend = settings.SESSION_BACKEND.lower()
+    ttl = settings.SESSION_TTL_SECONDS
+    cap = settings.MAX_SESSIONS
+
+    if backend == "sqlite":
+        return SQLiteSessionBackend(settings.SESSION_DB_FILE, ttl_seconds=ttl, max_sessions=cap)
+    if backend == "redis":
+        return RedisSessionBackend(settings.REDIS_URL, ttl_seconds=ttl, max_sessions=cap)
+    return MemorySessionBackend(ttl_seconds=ttl, max_sessions=cap)
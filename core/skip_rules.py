@@ -0,0 +1,58 @@
+from typing import Any, Callable
+from models import Question
+
+# Operator -> test of (previous answer, condition value)
+OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    "equals": lambda ref, value: ref == value,
+    "not_equals": lambda ref, value: ref != value,
+    "contains": lambda ref, value: isinstance(ref, list) and value in ref,
+    "not_contains": lambda ref, value: isinstance(ref, list) and value not in ref,
+}
+
+
+class SkipRules:
+    """`skip_when` conditions compiled once per question set.
+
+    Questions are referred to by position. `conditions[i]` holds the
+    (referenced position, test, value) conditions of question i, and
+    `dependents[i]` the questions whose skip state depends on its answer,
+    so recording an answer only re-evaluates the conditions that reference
+    it. Answers are passed as a list by position, None when unanswered.
+    """
+
+    def __init__(self, questions: list[Question]):
+        index_by_id = {question.id: idx for idx, question in enumerate(questions)}
+        conditions: list[list[tuple[int, Callable[[Any, Any], bool], Any]]] = [[] for _ in questions]
+        dependents: list[list[int]] = [[] for _ in questions]
+
+        for idx, question in enumerate(questions):
+            for condition in question.skip_when or ():
+                test = OPERATORS.get(condition.operator)
+                if test is None:
+                    print(f"Warning: Unknown skip operator '{condition.operator}' on {question.id}")
+                    continue
+                ref = index_by_id.get(condition.question_id)
+                if ref is None:
+                    # Never answered, so never matches
+                    continue
+                conditions[idx].append((ref, test, condition.value))
+                if idx not in dependents[ref]:
+                    dependents[ref].append(idx)
+
+        self.conditions: tuple[tuple[tuple[int, Callable[[Any, Any], bool], Any], ...], ...] = tuple(
+            tuple(question_conditions) for question_conditions in conditions
+        )
+        self.dependents: tuple[tuple[int, ...], ...] = tuple(tuple(ids) for ids in dependents)
+
+    def should_skip(self, index: int, values: list[Any]) -> bool:
+        """Check if ANY skip condition of the question at `index` matches the answers so far."""
+        for ref, test, value in self.conditions[index]:
+            ref_value = values[ref]
+            if ref_value is not None and test(ref_value, value):
+                return True
+        return False
+
+    def update(self, index: int, values: list[Any], skipped: bytearray) -> None:
+        """Re-evaluate the questions affected by a new answer to the question at `index`."""
+        for dependent in self.dependents[index]:
+            skipped[dependent] = self.should_skip(dependent, values)
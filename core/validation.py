@@ -0,0 +1,144 @@
+import re
+from datetime import datetime, date
+from typing import Any, Callable, NamedTuple
+from models import Question, QuestionType
+
+
+class ValidationResult(NamedTuple):
+    """Outcome of validating a response.
+
+    `code` names the failed rule (e.g. "below_min") and `params` carries
+    the values needed to explain it, so messages can be built from
+    templates instead of parsing `message`.
+    """
+    is_valid: bool
+    message: str = ""
+    code: str = ""
+    params: dict[str, Any] = {}
+
+
+VALID = ValidationResult(True)
+
+Validator = Callable[[Any], ValidationResult]
+
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+YES_NO_VALUES = frozenset(["yes", "no", "true", "false", "1", "0"])
+
+
+def is_date_of_birth(question: Question) -> bool:
+    """Whether a date question asks for a date of birth (must be in the past)."""
+    q_text = question.text.lower()
+    return "birth" in q_text or "dob" in q_text or "born" in q_text
+
+
+def _is_option(value: Any, options: frozenset[str]) -> bool:
+    try:
+        return value in options
+    except TypeError:
+        # Unhashable values (e.g. a list for a radio question) are never options
+        return False
+
+
+def build_validator(question: Question) -> Validator:
+    """Compile the validation rules of a question into a closure.
+
+    Everything that depends only on the question (options, range, the
+    date-of-birth check) is worked out once here; the returned function
+    takes a response value and returns a ValidationResult.
+    """
+    required = question.required
+    options = frozenset(question.options) if question.options else None
+    allow_other = question.allow_other
+
+    def check_empty(value: Any) -> ValidationResult | None:
+        if value is None or value == "" or value == []:
+            if required:
+                return ValidationResult(False, "This question requires an answer.", "required")
+            return VALID
+        return None
+
+    match question.type:
+        case QuestionType.NUMERIC:
+            min_value = question.min_value
+            max_value = question.max_value
+
+            def check(value: Any) -> ValidationResult:
+                try:
+                    num_val = float(value)
+                except (ValueError, TypeError):
+                    return ValidationResult(False, "Please enter a valid number", "not_a_number")
+                if num_val < 0:
+                    return ValidationResult(False, "Please enter a positive number", "negative")
+                if min_value is not None and num_val < min_value:
+                    return ValidationResult(
+                        False, f"Value must be at least {min_value}", "below_min", {"min": min_value}
+                    )
+                if max_value is not None and num_val > max_value:
+                    return ValidationResult(
+                        False, f"Value must be at most {max_value}", "above_max", {"max": max_value}
+                    )
+                return VALID
+
+        case QuestionType.RADIO:
+            choices = ", ".join(question.options or [])
+
+            def check(value: Any) -> ValidationResult:
+                if options and not allow_other and not _is_option(value, options):
+                    return ValidationResult(
+                        False, f"Please select one of: {choices}", "not_an_option", {"options": choices}
+                    )
+                return VALID
+
+        case QuestionType.CHECKBOX:
+            choices = ", ".join(question.options or [])
+
+            def check(value: Any) -> ValidationResult:
+                if not isinstance(value, list):
+                    return ValidationResult(False, "Please select options from the list", "not_a_list")
+                if options and not allow_other:
+                    invalid = [v for v in value if not _is_option(v, options)]
+                    if invalid:
+                        invalid_str = ", ".join(str(v) for v in invalid)
+                        return ValidationResult(
+                            False, f"Invalid options: {invalid_str}", "invalid_options",
+                            {"invalid": invalid_str, "options": choices}
+                        )
+                return VALID
+
+        case QuestionType.YES_NO:
+            def check(value: Any) -> ValidationResult:
+                if str(value).lower() not in YES_NO_VALUES:
+                    return ValidationResult(False, "Please answer Yes or No", "not_yes_no")
+                return VALID
+
+        case QuestionType.DATE:
+            must_be_past = is_date_of_birth(question)
+
+            def check(value: Any) -> ValidationResult:
+                if not DATE_PATTERN.match(str(value)):
+                    return ValidationResult(False, "Please enter a valid date (YYYY-MM-DD)", "bad_date_format")
+                # Check if DOB is in the past
+                if must_be_past:
+                    try:
+                        entered_date = datetime.strptime(str(value), "%Y-%m-%d").date()
+                    except ValueError:
+                        return ValidationResult(False, "Invalid date", "invalid_date")
+                    if entered_date >= date.today():
+                        return ValidationResult(False, "Date of birth must be in the past", "date_not_past")
+                return VALID
+
+        case QuestionType.TEXT:
+            def check(value: Any) -> ValidationResult:
+                if not isinstance(value, str) or len(value.strip()) == 0:
+                    if required:
+                        return ValidationResult(False, "Please provide a text response", "empty_text")
+                return VALID
+
+        case _:
+            def check(value: Any) -> ValidationResult:
+                return VALID
+
+    def validate(value: Any) -> ValidationResult:
+        return check_empty(value) or check(value)
+
+    return validate
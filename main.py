@@ -1,26 +1,121 @@
-from contextlib import asynccontextmanager
+import time
+_import_started = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager, contextmanager
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import Any
 
-from core import Questionnaire
-from storage import GoogleSheetsStorage
+from core import CompiledQuestionnaire, Questionnaire, SessionState
+from core.json_codec import dumps, with_raw_field
+from core.metrics import (
+    AI_IN_FLIGHT,
+    AI_QUEUE_DEPTH,
+    HTTP_SECONDS,
+    REGISTRY,
+    SESSIONS_LIVE,
+    STAGE_SECONDS,
+    STARTUP_SECONDS,
+    monitor_event_loop_lag,
+)
+from models import AIMessage
+from storage import SheetsExporter, WriteBehindQueue, get_response_storage, get_storage
 from config import settings
 
+# Seconds per startup phase, reported in the logs, /health and /metrics
+startup_timings: dict[str, float] = {}
+
+
+def record_startup(phase: str, seconds: float) -> None:
+    startup_timings[phase] = round(seconds, 3)
+    STARTUP_SECONDS.set(seconds, phase=phase)
+
+
+@contextmanager
+def startup_phase(phase: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_startup(phase, time.perf_counter() - started)
+
+
+record_startup("imports", time.perf_counter() - _import_started)
+
 
 questionnaire = Questionnaire()
+write_queue = WriteBehindQueue(
+    get_response_storage,
+    settings.SPOOL_DIR,
+    batch_size=settings.WRITE_BATCH_SIZE,
+    max_retry_delay=settings.WRITE_MAX_RETRY_DELAY
+)
+
+
+def local_response_storage() -> bool:
+    """Whether completed sessions are saved locally and exported to Sheets later."""
+    return settings.RESPONSE_STORAGE.lower() in ("sqlite", "jsonl")
+
+
+def warm_up_clients() -> None:
+    """Import and build the heavy API clients before the first request needs them."""
+    with startup_phase("warm_up_ai"):
+        questionnaire.ai_client.warm_up()
+    if settings.GOOGLE_SHEET_ID:
+        # Connect the shared Sheets client once
+        with startup_phase("warm_up_sheets"):
+            try:
+                get_storage()
+            except Exception as e:
+                print(f"Warning: Could not connect to Google Sheets: {e}")
+
+
+async def watch_questions() -> None:
+    """Poll the question source and hot-swap edited questions."""
+    while True:
+        await asyncio.sleep(settings.QUESTIONS_RELOAD_INTERVAL)
+        try:
+            await asyncio.to_thread(questionnaire.reload_questions)
+        except Exception as e:
+            print(f"Warning: Could not reload questions: {e}")
+
+
+async def warm_up() -> None:
+    with startup_phase("warm_up"):
+        await asyncio.to_thread(warm_up_clients)
+    print("Startup: " + ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in startup_timings.items()))
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    questionnaire.initialize()
+    # Startup: only what is needed to serve, the clients warm up in the background
+    with startup_phase("ready"):
+        questionnaire.initialize()
+        if settings.GOOGLE_SHEET_ID or local_response_storage():
+            await write_queue.start()
+    background = [
+        asyncio.create_task(warm_up()),
+        asyncio.create_task(monitor_event_loop_lag()),
+    ]
+    if settings.QUESTIONS_RELOAD_INTERVAL > 0:
+        background.append(asyncio.create_task(watch_questions()))
+    if local_response_storage() and settings.GOOGLE_SHEET_ID and settings.SHEETS_EXPORT_INTERVAL > 0:
+        exporter = SheetsExporter(
+            get_response_storage(),
+            get_storage,
+            interval=settings.SHEETS_EXPORT_INTERVAL,
+            batch_size=settings.SHEETS_EXPORT_BATCH_SIZE
+        )
+        background.append(asyncio.create_task(exporter.run()))
     yield
     # Shutdown
-    pass
+    for task in background:
+        task.cancel()
+    await write_queue.stop()
 
 
 app = FastAPI(
@@ -32,12 +127,36 @@ app = FastAPI(
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
+SESSIONS_LIVE.set_function(lambda: len(questionnaire.sessions))
+AI_QUEUE_DEPTH.set_function(lambda: questionnaire.ai_client.scheduler.queue_depth)
+AI_IN_FLIGHT.set_function(lambda: questionnaire.ai_client.scheduler.in_flight)
+
+
+@app.middleware("http")
+async def time_api_requests(request: Request, call_next):
+    """Record API latency per route (until the response starts, for streams)."""
+    if not request.url.path.startswith("/api/"):
+        return await call_next(request)
+
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    HTTP_SECONDS.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        path=route.path if route else "unmatched"
+    )
+    return response
+
 
+# Documents the /api/start and /api/respond bodies, which are encoded
+# directly around each question's cached JSON (see answer_json)
 class StartResponse(BaseModel):
     session_id: str
     message: str
     question: dict | None
     is_complete: bool
+    schema_version: str
 
 
 class ResponseRequest(BaseModel):
@@ -45,6 +164,18 @@ class ResponseRequest(BaseModel):
     value: Any
 
 
+class BatchRequest(BaseModel):
+    session_id: str
+    answers: dict[str, Any]  # question_id -> value
+    closing_message: bool = False
+
+
+class BatchResponse(BaseModel):
+    is_complete: bool
+    errors: dict[str, str]  # question_id -> validation message
+    message: str | None = None
+
+
 class AnswerResponse(BaseModel):
     message: str
     question: dict | None
@@ -61,66 +192,234 @@ async def index(request: Request):
 @app.get("/health")
 async def health_check():
     """Health check endpoint for monitoring."""
-    return {"status": "healthy", "service": "ai-questionnaire"}
+    sheets = get_storage(connect=False)
+    if local_response_storage():
+        # Counting the export backlog reads from disk
+        storage_health = await asyncio.to_thread(get_response_storage().health)
+    else:
+        storage_health = {"backend": "sheets"}
+    return {
+        "status": "healthy",
+        "service": "ai-questionnaire",
+        "sheets": sheets.health() if sheets else {"connected": False},
+        "storage": storage_health,
+        "pending_saves": write_queue.pending,
+        "questions_version": questionnaire.question_loader.compiled.version,
+        "sessions": await questionnaire.sessions.astats(),
+        "ai": questionnaire.ai_client.stats,
+        "ai_scheduler": questionnaire.ai_client.scheduler.health(),
+        "startup": startup_timings
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics for this worker process."""
+    if questionnaire.sessions.blocking:
+        # The live session gauge queries the shared session backend
+        body = await asyncio.to_thread(REGISTRY.render)
+    else:
+        body = REGISTRY.render()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/api/schema")
+async def get_schema(request: Request, v: str | None = None):
+    """Questionnaire validation schema for client-side checks.
+
+    Fetch it as /api/schema?v=<schema_version> (from /api/start) to get an
+    immutable, long-cached response. The server still validates every answer.
+    """
+    # Sessions pinned to a replaced question set still get their own schema
+    versions = questionnaire.question_loader.versions()
+    compiled = next((c for c in versions if c.schema_etag == v), versions[0])
+    etag = f'"{compiled.schema_etag}"'
+    if v == compiled.schema_etag:
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        cache_control = "public, max-age=300"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=compiled.schema_json, media_type="application/json", headers=headers)
 
 
 @app.post("/api/start", response_model=StartResponse)
 async def start_questionnaire():
     """Start a new questionnaire session."""
-    session_id = questionnaire.create_session()
-    ai_response = await questionnaire.start_session(session_id)
-
-    return StartResponse(
-        session_id=session_id,
-        message=ai_response.message,
-        question=ai_response.question.model_dump() if ai_response.question else None,
-        is_complete=ai_response.is_complete
-    )
+    session = await questionnaire.create_session()
+    ai_response = await questionnaire.start_session(session)
+    compiled = questionnaire.get_compiled(session)
+
+    return json_response(with_raw_field({
+        "session_id": session.session_id,
+        "message": ai_response.message,
+        "is_complete": ai_response.is_complete,
+        "schema_version": compiled.schema_etag,
+    }, "question", compiled.question_payload(ai_response.question) if ai_response.question else None))
+
+
+async def save_completed(session: SessionState) -> None:
+    """Queue a completed session's responses for storage.
+
+    Shielded, so a client disconnecting mid-request can't drop the save.
+    """
+    await asyncio.shield(queue_responses(session))
+
+
+async def queue_responses(session: SessionState) -> None:
+    if not settings.GOOGLE_SHEET_ID and not local_response_storage():
+        print("Warning: Could not save to Google Sheets: GOOGLE_SHEET_ID not set in environment.")
+        return
+
+    try:
+        questions = questionnaire.get_questions_for_sheet_header(session)
+        question_ids = questionnaire.get_question_ids_for_sheet(session)
+        values = questionnaire.get_responses_for_sheet_row(session)
+        with STAGE_SECONDS.time(stage="save_enqueue"):
+            await write_queue.enqueue(session.session_id, questions, values, question_ids)
+        # Responses are safely spooled, the session is no longer needed
+        await questionnaire.sessions.aoffload(session)
+    except Exception as e:
+        print(f"Warning: Could not queue responses for storage: {e}")
+
+
+def json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+def answer_json(ai_response: AIMessage, compiled: CompiledQuestionnaire) -> bytes:
+    """An AnswerResponse body, built around the question's JSON cached in `compiled`."""
+    question = ai_response.question
+    return with_raw_field({
+        "message": ai_response.message,
+        "is_complete": ai_response.is_complete,
+        "needs_clarification": ai_response.needs_clarification,
+    }, "question", compiled.question_payload(question) if question else None)
+
+
+def sse_event(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+async def is_offloaded(session_id: str) -> bool:
+    """Whether the session was completed and its responses already saved."""
+    return await questionnaire.sessions.aget_completed(session_id) is not None
+
+
+# The reply to an answer for a session that is already complete (e.g. a retried final answer)
+ALREADY_COMPLETE = AIMessage(message="No current question", is_complete=True)
 
 
 @app.post("/api/respond", response_model=AnswerResponse)
 async def submit_response(request: ResponseRequest):
     """Submit a response and get the next question."""
-    session = questionnaire.get_session(request.session_id)
+    session = await questionnaire.get_session(request.session_id)
     if not session:
+        if await is_offloaded(request.session_id):
+            return json_response(answer_json(ALREADY_COMPLETE, questionnaire.get_compiled()))
         raise HTTPException(status_code=404, detail="Session not found")
 
+    # If completed, the responses are queued for storage before the closing message
     ai_response = await questionnaire.process_response(
-        request.session_id,
-        request.value
+        session,
+        request.value,
+        on_complete=save_completed
     )
 
-    # If completed, save to Google Sheets
-    if ai_response.is_complete and not ai_response.needs_clarification:
-        try:
-            sheets = GoogleSheetsStorage()
-            questions = questionnaire.get_questions_for_sheet_header()
-            values = questionnaire.get_responses_for_sheet_row(request.session_id)
-            sheets.save_responses(questions, values, session_id=request.session_id)
-        except Exception as e:
-            print(f"Warning: Could not save to Google Sheets: {e}")
+    return json_response(answer_json(ai_response, questionnaire.get_compiled(session)))
+
+
+@app.post("/api/respond/stream")
+async def submit_response_stream(request: ResponseRequest):
+    """Submit a response and stream the reply as server-sent events.
 
-    return AnswerResponse(
-        message=ai_response.message,
-        question=ai_response.question.model_dump() if ai_response.question else None,
-        is_complete=ai_response.is_complete,
-        needs_clarification=ai_response.needs_clarification
+    Events: `message` (appreciation), `delta` (next phrasing chunks) and
+    `final` (the same payload /api/respond returns).
+    """
+    session = await questionnaire.get_session(request.session_id)
+    if not session and not await is_offloaded(request.session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    compiled = questionnaire.get_compiled(session)
+
+    async def events():
+        if not session:
+            yield sse_event("final", answer_json(ALREADY_COMPLETE, compiled).decode("utf-8"))
+            return
+        async for event, data in questionnaire.process_response_stream(
+            session,
+            request.value,
+            on_complete=save_completed
+        ):
+            if event == "final":
+                yield sse_event(event, answer_json(data, compiled).decode("utf-8"))
+            else:
+                yield sse_event(event, dumps({"text": data}).decode("utf-8"))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 
+@app.post("/api/respond/batch", response_model=BatchResponse)
+async def submit_batch(request: BatchRequest):
+    """Submit answers to all remaining questions at once, without the chat.
+
+    Every answer is validated; if any fail, nothing is recorded and all the
+    errors are returned. The AI is only called when `closing_message` is set.
+    """
+    session = await questionnaire.get_session(request.session_id)
+    if not session:
+        if await is_offloaded(request.session_id):
+            raise HTTPException(status_code=409, detail="Session already completed")
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    try:
+        errors = await questionnaire.submit_batch(session, request.answers)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if errors:
+        return BatchResponse(is_complete=False, errors=errors)
+
+    await save_completed(session)
+
+    message = None
+    if request.closing_message:
+        message = await questionnaire.ai_client.completion_message()
+
+    return BatchResponse(is_complete=True, errors={}, message=message)
+
+
 @app.get("/api/status/{session_id}")
 async def get_status(session_id: str):
     """Get session status."""
-    session = questionnaire.get_session(session_id)
+    session = await questionnaire.get_session(session_id)
     if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+        # Completed sessions are dropped once saved, but their completion is kept for the TTL
+        completed = await questionnaire.sessions.aget_completed(session_id)
+        if not completed:
+            raise HTTPException(status_code=404, detail="Session not found")
+        total_questions, response_count = completed
+        return {
+            "session_id": session_id,
+            "current_question": total_questions,
+            "total_questions": total_questions,
+            "completed": True,
+            "response_count": response_count
+        }
 
     return {
         "session_id": session_id,
         "current_question": session.current_question_index,
-        "total_questions": questionnaire.question_loader.total_questions,
+        "total_questions": len(questionnaire.get_compiled(session)),
         "completed": session.completed,
-        "response_count": len(session.responses)
+        "response_count": session.response_count
     }
 
 
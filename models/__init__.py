@@ -2,8 +2,6 @@ from .schemas import (
     Question,
     QuestionType,
     SkipCondition,
-    UserResponse,
-    SessionState,
     AIMessage,
     ResponseRequest,
 )
@@ -12,8 +10,6 @@ __all__ = [
     "Question",
     "QuestionType",
     "SkipCondition",
-    "UserResponse",
-    "SessionState",
     "AIMessage",
     "ResponseRequest",
 ]
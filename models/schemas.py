@@ -35,20 +35,6 @@ class Question(BaseModel):
         populate_by_name = True
 
 
-class UserResponse(BaseModel):
-    question_id: str
-    value: Any
-    timestamp: str | None = None
-
-
-class SessionState(BaseModel):
-    session_id: str
-    current_question_index: int = 0
-    responses: list[UserResponse] = Field(default_factory=list)
-    completed: bool = False
-    awaiting_clarification: bool = False
-
-
 class AIMessage(BaseModel):
     message: str
     question: Question | None = None
@@ -0,0 +1,39 @@
+"""Build the pre-generated question phrasing bank.
+
+Usage (from the project root):
+
+    uv run python -m scripts.build_phrasing_bank [--count 5] [--output phrasing_bank.json]
+"""
+import argparse
+import asyncio
+from config import settings
+from core import AIClient, QuestionLoader
+from core.ai_cache import PromptCache
+from core.phrasing_bank import build_phrasing_bank
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the question phrasing bank")
+    parser.add_argument("--count", type=int, default=settings.PHRASING_BANK_SIZE,
+                        help="Number of rephrasings to generate per question")
+    parser.add_argument("--output", default=settings.PHRASING_BANK_FILE,
+                        help="Path of the bank artifact to write")
+    args = parser.parse_args()
+
+    questions = QuestionLoader().load()
+    if not questions:
+        print("No questions configured, nothing to build.")
+        return
+
+    ai_client = AIClient()
+    # Offline build: no need to hold the model to the interactive latency
+    # budget, and every call should be a fresh generation
+    ai_client.budgets["present"] = 60
+    ai_client.cache = PromptCache(max_entries=0)
+    bank = await build_phrasing_bank(questions, ai_client, args.count)
+    bank.save(args.output)
+    print(f"Wrote {len(bank.entries)}/{len(questions)} questions to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
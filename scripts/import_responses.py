@@ -0,0 +1,74 @@
+"""Import completed questionnaires from a CSV or JSONL file.
+
+Columns (CSV header or JSONL keys) are question ids or question texts, plus
+optional `session_id` and `completed_at`. Accepted rows are saved to the
+configured RESPONSE_STORAGE. Usage (from the project root):
+
+    uv run python -m scripts.import_responses responses.csv [--rejects rejects.csv] [--dry-run]
+"""
+import argparse
+import time
+from pathlib import Path
+from core import QuestionLoader
+from core.bulk_import import BulkImporter
+from storage import get_response_storage
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk import questionnaire responses")
+    parser.add_argument("file", help="CSV or JSONL file with one completed questionnaire per row")
+    parser.add_argument("--rejects", help="Where to write the rejected-rows report "
+                                          "(default: <file>.rejects.csv)")
+    parser.add_argument("--chunk-size", type=int, default=1000,
+                        help="Rows validated per chunk")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="Accepted rows saved per storage batch")
+    parser.add_argument("--workers", type=int,
+                        help="Validation processes (default: 1, or one per CPU for big files)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Validate and write the report without saving anything")
+    args = parser.parse_args()
+
+    path = Path(args.file)
+    rejects_path = args.rejects or path.with_name(path.name + ".rejects.csv")
+
+    loader = QuestionLoader()
+    if not loader.load():
+        print("No questions configured, nothing to import.")
+        return
+
+    storage = None
+    if not args.dry_run:
+        try:
+            storage = get_response_storage()
+        except Exception as e:
+            # e.g. GOOGLE_SHEET_ID or the credentials are missing
+            print(f"Could not open response storage: {e}")
+            storage = None
+        if not storage or not storage.is_connected():
+            print("Google Sheets is not connected, use --dry-run to only validate.")
+            return
+
+    importer = BulkImporter(
+        loader.compiled,
+        storage,
+        chunk_size=args.chunk_size,
+        batch_size=args.batch_size,
+        workers=args.workers or BulkImporter.default_workers(path)
+    )
+    started = time.perf_counter()
+    try:
+        stats = importer.run(path, rejects_path)
+    except RuntimeError as e:
+        print(f"Import stopped: {e}")
+        stats = importer.stats
+    elapsed = time.perf_counter() - started
+
+    print(f"Read {stats['rows']} rows in {elapsed:.1f}s: {stats['accepted']} accepted, "
+          f"{stats['rejected']} rejected, {stats['saved']} saved")
+    if stats["rejected"]:
+        print(f"Rejected rows: {rejects_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ class QuestionnaireApp {
         this.currentQuestion = null;
         this.totalQuestions = 0;
         this.answeredCount = 0;
+        this.schema = null;
+        this.yesNoValues = [];
 
         this.messagesEl = document.getElementById('messages');
         this.inputAreaEl = document.getElementById('input-area');
@@ -26,6 +28,7 @@ class QuestionnaireApp {
             this.removeLoadingMessage();
             this.sessionId = data.session_id;
             this.currentQuestion = data.question;
+            this.loadSchema(data.schema_version);
 
             this.addMessage(data.message, 'ai');
 
@@ -39,14 +42,90 @@ class QuestionnaireApp {
         }
     }
 
+    async loadSchema(version) {
+        try {
+            // Versioned URL, so the browser can cache it for good
+            const response = await fetch(`/api/schema?v=${encodeURIComponent(version)}`);
+            const schema = await response.json();
+            this.schema = {};
+            schema.questions.forEach(q => { this.schema[q.id] = q; });
+            this.yesNoValues = schema.yes_no_values;
+        } catch (error) {
+            // Without the schema every answer is checked by the server
+            this.schema = null;
+        }
+    }
+
+    validateLocally(question, value) {
+        // Mirrors core/validation.py; the server remains the authority
+        const rules = this.schema && question && this.schema[question.id];
+        if (!rules) return null;
+
+        const isEmpty = value === null || value === undefined || value === '' ||
+            (Array.isArray(value) && value.length === 0);
+        if (isEmpty) return rules.required ? 'This question requires an answer.' : null;
+
+        switch (rules.type) {
+            case 'numeric': {
+                const num = Number(value);
+                if (Number.isNaN(num)) return 'Please enter a valid number';
+                if (num < 0) return 'Please enter a positive number';
+                if (rules.min !== null && num < rules.min) return `Value must be at least ${rules.min}`;
+                if (rules.max !== null && num > rules.max) return `Value must be at most ${rules.max}`;
+                return null;
+            }
+            case 'radio':
+                if (rules.options && rules.options.length && !rules.allow_other && !rules.options.includes(value)) {
+                    return `Please select one of: ${rules.options.join(', ')}`;
+                }
+                return null;
+            case 'checkbox': {
+                if (!Array.isArray(value)) return 'Please select options from the list';
+                if (rules.options && rules.options.length && !rules.allow_other) {
+                    const invalid = value.filter(v => !rules.options.includes(v));
+                    if (invalid.length) return `Invalid options: ${invalid.join(', ')}`;
+                }
+                return null;
+            }
+            case 'yes_no':
+                if (!this.yesNoValues.includes(String(value).toLowerCase())) return 'Please answer Yes or No';
+                return null;
+            case 'date': {
+                if (!/^\d{4}-\d{2}-\d{2}$/.test(String(value))) return 'Please enter a valid date (YYYY-MM-DD)';
+                if (rules.must_be_past) {
+                    const now = new Date();
+                    const pad = n => String(n).padStart(2, '0');
+                    const today = `${now.getFullYear()}-${pad(now.getMonth() + 1)}-${pad(now.getDate())}`;
+                    if (String(value) >= today) return 'Date of birth must be in the past';
+                }
+                return null;
+            }
+            case 'text':
+                if (typeof value !== 'string' || !value.trim()) {
+                    return rules.required ? 'Please provide a text response' : null;
+                }
+                return null;
+            default:
+                return null;
+        }
+    }
+
     async submitResponse(value) {
+        // Reject invalid answers without a round trip
+        const localError = this.validateLocally(this.currentQuestion, value);
+        if (localError) {
+            this.addMessage(localError, 'ai');
+            this.showInput(this.currentQuestion);
+            return;
+        }
+
         // Add user message
         this.addUserMessage(value);
         this.inputAreaEl.classList.add('hidden');
         this.addLoadingMessage();
 
         try {
-            const response = await fetch('/api/respond', {
+            const response = await fetch('/api/respond/stream', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
@@ -54,11 +133,31 @@ class QuestionnaireApp {
                     value: value
                 })
             });
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+
+            // Render the reply progressively as server-sent events arrive
+            let messageEl = null;
+            let data = null;
+            await this.readEvents(response, (event, payload) => {
+                if (event === 'final') {
+                    data = payload;
+                    return;
+                }
+                if (!messageEl) {
+                    this.removeLoadingMessage();
+                    messageEl = this.addMessage('', 'ai');
+                }
+                messageEl.textContent += payload.text;
+                this.scrollToBottom();
+            });
+            if (!data) throw new Error('Incomplete response');
 
-            const data = await response.json();
             this.removeLoadingMessage();
-
-            this.addMessage(data.message, 'ai');
+            if (messageEl) {
+                messageEl.textContent = data.message;
+            } else {
+                this.addMessage(data.message, 'ai');
+            }
 
             if (data.is_complete) {
                 this.showCompletion();
@@ -77,12 +176,39 @@ class QuestionnaireApp {
         }
     }
 
+    async readEvents(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const raw = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+
+                let event = 'message';
+                let data = '';
+                raw.split('\n').forEach(line => {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                });
+                if (data) onEvent(event, JSON.parse(data));
+            }
+        }
+    }
+
     addMessage(text, type) {
         const div = document.createElement('div');
         div.className = `message ${type}`;
         div.textContent = text;
         this.messagesEl.appendChild(div);
         this.scrollToBottom();
+        return div;
     }
 
     addUserMessage(value) {
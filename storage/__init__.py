@@ -1,3 +1,17 @@
-from .google_sheets import GoogleSheetsStorage
+from .base import LocalStorage, StorageBackend
+from .exporter import SheetsExporter
+from .google_sheets import GoogleSheetsStorage, get_storage
+from .local import JSONLResponseStorage, SQLiteResponseStorage, get_response_storage
+from .write_behind import WriteBehindQueue
 
-__all__ = ["GoogleSheetsStorage"]
+__all__ = [
+    "GoogleSheetsStorage",
+    "JSONLResponseStorage",
+    "LocalStorage",
+    "SQLiteResponseStorage",
+    "SheetsExporter",
+    "StorageBackend",
+    "WriteBehindQueue",
+    "get_response_storage",
+    "get_storage",
+]
@@ -0,0 +1,58 @@
+from abc import ABC, abstractmethod
+from typing import Any
+
+
+class StorageBackend(ABC):
+    """Where completed sessions are saved.
+
+    A session is a dict with "responses", and optionally "session_id",
+    "completed_at" (ISO timestamp), "questions" and "question_ids", as
+    spooled by the write-behind queue.
+    """
+
+    name = "storage"
+
+    @abstractmethod
+    def save_batch(self, sessions: list[dict]) -> bool:
+        """Save several sessions at once. Returns False if nothing was saved."""
+
+    @abstractmethod
+    def health(self) -> dict:
+        """State and counters for monitoring."""
+
+    def save_responses(
+        self,
+        questions: list[str],
+        responses: list[str],
+        session_id: str | None = None
+    ) -> bool:
+        """Save a single session."""
+        return self.save_batch([{
+            "session_id": session_id,
+            "questions": questions,
+            "responses": responses,
+        }])
+
+    def is_connected(self) -> bool:
+        return True
+
+
+class LocalStorage(StorageBackend):
+    """A local store of completed sessions that are later exported elsewhere.
+
+    Sessions are read back in the order they were saved. `read_unexported`
+    returns the next ones after the export cursor, and `mark_exported`
+    moves the cursor past them once they are safely exported.
+    """
+
+    @abstractmethod
+    def read_unexported(self, limit: int) -> tuple[list[dict], Any]:
+        """Up to `limit` sessions not yet exported, and the cursor just past them."""
+
+    @abstractmethod
+    def mark_exported(self, cursor: Any) -> None:
+        """Record that everything before `cursor` has been exported."""
+
+    @abstractmethod
+    def pending_export(self) -> int:
+        """Number of saved sessions not yet exported."""
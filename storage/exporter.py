@@ -0,0 +1,67 @@
+import asyncio
+import fcntl
+from pathlib import Path
+from typing import Callable
+from core.metrics import SHEETS_SAVES, SHEETS_SAVE_FAILURES, STAGE_SECONDS
+from .base import LocalStorage, StorageBackend
+
+
+class SheetsExporter:
+    """Periodically copies sessions from local storage to Google Sheets.
+
+    Every `interval` seconds, sessions saved since the last export are sent
+    in `batch_size` chunks through `save_batch`, and the local export cursor
+    moves past each chunk once it is saved. A failed chunk is retried on the
+    next run. With several workers, only the one holding the export lock
+    file (next to the local store) exports.
+    """
+
+    def __init__(
+        self,
+        local: LocalStorage,
+        sheets_factory: Callable[[], StorageBackend],
+        interval: float = 60.0,
+        batch_size: int = 500
+    ):
+        self.local = local
+        self.sheets_factory = sheets_factory
+        self.interval = interval
+        self.batch_size = batch_size
+        self.lock_path = Path(f"{local.path}.export.lock")
+
+    async def run(self) -> None:
+        """Export forever (run as a background task)."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                exported = await asyncio.to_thread(self.export_once)
+            except Exception as e:
+                print(f"Warning: Could not export responses to Google Sheets: {e}")
+                continue
+            if exported:
+                print(f"Exported {exported} session(s) to Google Sheets")
+
+    def export_once(self) -> int:
+        """Export everything not yet exported. Returns the number of sessions exported."""
+        with open(self.lock_path, "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another worker is exporting
+                return 0
+
+            exported = 0
+            while True:
+                sessions, cursor = self.local.read_unexported(self.batch_size)
+                if not sessions:
+                    return exported
+
+                with STAGE_SECONDS.time(stage="sheets_write"):
+                    saved = self.sheets_factory().save_batch(sessions)
+                if not saved:
+                    SHEETS_SAVE_FAILURES.inc()
+                    return exported
+
+                SHEETS_SAVES.inc(len(sessions))
+                self.local.mark_exported(cursor)
+                exported += len(sessions)
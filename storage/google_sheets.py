@@ -1,15 +1,51 @@
 import re
+import fcntl
+import hashlib
 import json
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-import gspread
-from google.oauth2.service_account import Credentials
+from typing import TYPE_CHECKING, Callable, TypeVar
 from pathlib import Path
 from config import settings
 from models import Question, QuestionType
+from .base import StorageBackend
 
+# gspread and google-auth are slow to import and only needed once we connect
+if TYPE_CHECKING:
+    import gspread
+    from google.oauth2.service_account import Credentials
 
-class GoogleSheetsStorage:
-    """Google Sheets storage for questions and responses."""
+T = TypeVar("T")
+
+# Cell A1 values that mark row 1 as a header row
+HEADER_LABELS = ("question", "questions")
+
+_shared_storage: "GoogleSheetsStorage | None" = None
+_shared_lock = threading.Lock()
+
+class GoogleSheetsStorage(StorageBackend):
+    """Google Sheets storage for questions and responses.
+
+    Questions are read from column A of the first worksheet. Responses are
+    written in one of two layouts (SHEETS_LAYOUT):
+
+    - "columns": one column per session next to the questions.
+    - "rows": one appended row per session on a separate worksheet, under a
+      header row of question ids. Saves don't read the response history, so
+      they cost the same however many sessions are stored.
+
+    Both layouts read the sheet before writing (the next free column, the
+    header row), so saves from all worker processes on the host are
+    serialized by a lock file in the spool directory.
+    """
+
+    name = "sheets"
+
+    # Fixed columns before the answers in the "rows" layout
+    ROW_HEADER = ["Completed at", "Session"]
+    # Columns added at a time when the "columns" layout runs out of grid
+    GROW_COLUMNS = 100
 
     SCOPES = [
         "https://www.googleapis.com/auth/spreadsheets",
@@ -17,63 +53,138 @@ class GoogleSheetsStorage:
     ]
 
     def __init__(self):
-        self.client: gspread.Client | None = None
-        self.spreadsheet: gspread.Spreadsheet | None = None
-        self.worksheet: gspread.Worksheet | None = None
+        self.client: "gspread.Client | None" = None
+        self.spreadsheet: "gspread.Spreadsheet | None" = None
+        self.worksheet: "gspread.Worksheet | None" = None
+        self.credentials: "Credentials | None" = None
+        self.responses_worksheet: "gspread.Worksheet | None" = None
+        # Header row of the responses worksheet, read once and then kept in sync
+        self._response_header: list[str] | None = None
+        # Column layout: whether row 1 is a header, and the next free column
+        # as far as this process knows (checked before each write)
+        self._has_header: bool | None = None
+        self._next_column: int | None = None
+        self._lock = threading.RLock()
+        self.stats = {
+            "connects": 0,
+            "requests": 0,
+            "errors": 0,
+            "last_error": None,
+            "connected_at": None,
+            "last_success_at": None,
+        }
         self._connect()
 
-    def _connect(self) -> None:
-        """Connect to Google Sheets using service account credentials."""
-        if not settings.GOOGLE_SHEET_ID:
-            raise ValueError("GOOGLE_SHEET_ID not set in environment.")
+    def _load_credentials(self) -> "Credentials":
+        """Load service account credentials from the environment or a file."""
+        from google.oauth2.service_account import Credentials
 
         # Production: Use JSON credentials from environment variable
         if settings.GOOGLE_CREDENTIALS_JSON:
             try:
                 credentials_info = json.loads(settings.GOOGLE_CREDENTIALS_JSON)
-                credentials = Credentials.from_service_account_info(
+                return Credentials.from_service_account_info(
                     credentials_info,
                     scopes=self.SCOPES
                 )
             except json.JSONDecodeError as e:
                 raise ValueError(f"Invalid JSON in GOOGLE_CREDENTIALS_JSON: {e}")
-        else:
-            # Development: Use credentials file
-            creds_path = Path(settings.GOOGLE_CREDENTIALS_FILE)
-            if not creds_path.exists():
-                raise FileNotFoundError(
-                    f"Google credentials file not found at {creds_path}. "
-                    f"For production, set GOOGLE_CREDENTIALS_JSON environment variable."
-                )
-            
-            credentials = Credentials.from_service_account_file(
-                str(creds_path),
-                scopes=self.SCOPES
+
+        # Development: Use credentials file
+        creds_path = Path(settings.GOOGLE_CREDENTIALS_FILE)
+        if not creds_path.exists():
+            raise FileNotFoundError(
+                f"Google credentials file not found at {creds_path}. "
+                f"For production, set GOOGLE_CREDENTIALS_JSON environment variable."
             )
 
-        self.client = gspread.authorize(credentials)
+        return Credentials.from_service_account_file(
+            str(creds_path),
+            scopes=self.SCOPES
+        )
+
+    def _connect(self) -> None:
+        """Connect to Google Sheets using service account credentials.
+
+        Credentials are parsed once and kept; gspread's authorized session
+        refreshes the access token on its own, so reconnecting is only
+        needed if the session is rejected outright.
+        """
+        if not settings.GOOGLE_SHEET_ID:
+            raise ValueError("GOOGLE_SHEET_ID not set in environment.")
+
+        import gspread
+
+        if self.credentials is None:
+            self.credentials = self._load_credentials()
+
+        self.client = gspread.authorize(self.credentials)
         self.spreadsheet = self.client.open_by_key(settings.GOOGLE_SHEET_ID)
         self.worksheet = self.spreadsheet.sheet1
+        # Opened again through the new client on the next rows-layout save
+        self.responses_worksheet = None
+        self._response_header = None
+        self.stats["connects"] += 1
+        self.stats["connected_at"] = datetime.now().isoformat()
+
+    def _call(self, operation: Callable[[], T]) -> T:
+        """Run a Sheets operation, reconnecting once if the session was rejected."""
+        from gspread.exceptions import APIError
+
+        with self._lock:
+            self.stats["requests"] += 1
+            try:
+                try:
+                    result = operation()
+                except APIError as e:
+                    if e.response.status_code != 401:
+                        raise
+                    self._connect()
+                    result = operation()
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.stats["last_error"] = str(e)
+                raise
+            self.stats["last_success_at"] = datetime.now().isoformat()
+            return result
+
+    @contextmanager
+    def _write_lock(self):
+        """Hold the host-wide lock that serializes response writes between processes."""
+        lock_path = Path(settings.SPOOL_DIR) / "sheets.lock"
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(lock_path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def health(self) -> dict:
+        """Connection state and request counters for monitoring."""
+        return {"connected": self.is_connected(), **self.stats}
+
+    @property
+    def row_layout(self) -> bool:
+        return settings.SHEETS_LAYOUT.lower() == "rows"
 
     def load_questions(self) -> list[Question]:
         """Load questions from Column A of the sheet."""
         if not self.worksheet:
             return []
 
-        # Get all values from column A
-        all_values = self.worksheet.get_all_values()
-        if not all_values:
+        # Only column A; response columns are never downloaded
+        column = self._call(lambda: self.worksheet.col_values(1))
+        if not column:
             return []
 
         questions = []
         # Skip header if present
-        start = 1 if all_values[0][0].lower() in ["question", "questions"] else 0
+        self._has_header = column[0].lower() in HEADER_LABELS
+        start = 1 if self._has_header else 0
 
-        for idx, row in enumerate(all_values[start:], start=1):
-            if not row or not row[0].strip():
+        for idx, cell in enumerate(column[start:], start=1):
+            if not cell.strip():
                 continue
 
-            raw_text = row[0].strip()
+            raw_text = cell.strip()
             q_type, options, clean_text = self._parse_question(raw_text)
 
             questions.append(Question(
@@ -86,6 +197,13 @@ class GoogleSheetsStorage:
 
         return questions
 
+    def questions_revision(self) -> str:
+        """Hash of the question column, to check for edits without a full load."""
+        if not self.worksheet:
+            return ""
+        column = self._call(lambda: self.worksheet.col_values(1))
+        return hashlib.sha256("\n".join(column).encode("utf-8")).hexdigest()[:16]
+
     def _parse_question(self, text: str) -> tuple[QuestionType, list[str] | None, str]:
         """Parse question text to extract type, options, and clean text."""
         text_lower = text.lower()
@@ -132,17 +250,46 @@ class GoogleSheetsStorage:
 
         return q_type, options, text
 
-    def _get_next_column(self) -> str:
-        """Find the next available column for responses."""
-        if not self.worksheet:
-            return "B"
+    def _header_row(self) -> bool:
+        """Whether row 1 holds headers (A1 says "Question"), read once."""
+        if self._has_header is None:
+            first = self.worksheet.get("A1")
+            self._has_header = bool(first and first[0]) and first[0][0].lower() in HEADER_LABELS
+        return self._has_header
 
-        # Get first row to check how many columns have data
+    def _refresh_next_column(self) -> int:
+        """Re-read row 1 to find the next free column."""
         first_row = self.worksheet.row_values(1)
         # Next column is after the last filled column (Column A has questions)
-        next_col_index = len(first_row) + 1 if first_row else 2
-        # Convert to column letter (1=A, 2=B, etc.)
-        return self._col_index_to_letter(next_col_index)
+        self._next_column = len(first_row) + 1 if first_row else 2
+        return self._next_column
+
+    def _get_next_column_index(self, count: int = 1) -> int:
+        """Find the next available column index (1-based) for `count` responses.
+
+        The cached counter is confirmed by reading only the row 1 cells it
+        would write to. If another writer has taken them, row 1 is re-read.
+        The grid is widened first when the columns don't exist yet.
+        """
+        if not self.worksheet:
+            return 2
+
+        next_col = self._next_column
+        last_col = (next_col or 0) + count - 1
+        if next_col is None or last_col > self.worksheet.col_count:
+            next_col = self._refresh_next_column()
+        else:
+            first = self._col_index_to_letter(next_col)
+            last = self._col_index_to_letter(last_col)
+            taken = self.worksheet.get(f"{first}1:{last}1")
+            if any(any(row) for row in taken):
+                next_col = self._refresh_next_column()
+
+        missing = next_col + count - 1 - self.worksheet.col_count
+        if missing > 0:
+            # Grow ahead of need, so the next saves can use the cheap check
+            self.worksheet.add_cols(max(missing, self.GROW_COLUMNS))
+        return next_col
 
     def _col_index_to_letter(self, index: int) -> str:
         """Convert column index (1-based) to letter (A, B, ..., Z, AA, AB, ...)."""
@@ -153,55 +300,150 @@ class GoogleSheetsStorage:
             index //= 26
         return result
 
-    def save_responses(
-        self,
-        questions: list[str],
-        responses: list[str],
-        session_id: str | None = None
-    ) -> bool:
-        """Save responses to the next available column with session header.
-
-        Each user session gets its own column:
-        - Column A: Questions
-        - Column B, C, D, ...: Responses per session with timestamp header
+    def save_batch(self, sessions: list[dict]) -> bool:
+        """Save several sessions in a single request.
+
+        Each session is a dict with "responses", and optionally "session_id",
+        "completed_at" (ISO timestamp used for the column header) and
+        "question_ids" (the ids the responses belong to, for the "rows"
+        layout). Sessions go to consecutive columns, or are appended as rows
+        in the "rows" layout.
         """
         if not self.worksheet:
             return False
 
+        write = self._append_rows if self.row_layout else self._write_batch
         try:
-            all_values = self.worksheet.get_all_values()
-            has_header = all_values and all_values[0][0].lower() in ["question", "questions"]
-            start_row = 2 if has_header else 1
+            # Another worker could take the same column or header cells between our read and write
+            with self._write_lock():
+                self._call(lambda: write(sessions))
+            return True
+        except Exception as e:
+            print(f"Error saving to Google Sheets: {e}")
+            return False
+
+    def _write_batch(self, sessions: list[dict]) -> None:
+        """Write sessions to the next free columns (called under the lock)."""
+        has_header = self._header_row()
+        start_row = 2 if has_header else 1
+
+        # Find the next available columns
+        next_col_index = self._get_next_column_index(len(sessions))
 
-            # Find the next available column
-            column = self._get_next_column()
+        updates = []
+        for offset, session in enumerate(sessions):
+            column = self._col_index_to_letter(next_col_index + offset)
 
             # Create header with timestamp and short session ID
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
+            completed_at = session.get("completed_at")
+            when = datetime.fromisoformat(completed_at) if completed_at else datetime.now()
+            timestamp = when.strftime("%Y-%m-%d %H:%M")
+            session_id = session.get("session_id")
             short_id = session_id[:8] if session_id else "unknown"
             header = f"{timestamp} ({short_id})"
 
-            updates = []
-
             # Add header in row 1 if we have a header row
             if has_header:
                 updates.append({"range": f"{column}1", "values": [[header]]})
 
             # Add responses
-            for idx, response in enumerate(responses):
+            for idx, response in enumerate(session["responses"]):
                 row_num = start_row + idx
                 if isinstance(response, list):
                     response = ", ".join(str(r) for r in response)
                 updates.append({"range": f"{column}{row_num}", "values": [[str(response)]]})
 
-            if updates:
+        if updates:
+            try:
                 self.worksheet.batch_update(updates)
+            except Exception:
+                # The columns may or may not have been written; look again next time
+                self._next_column = None
+                raise
+            self._next_column = next_col_index + len(sessions)
 
-            return True
+    def _open_responses_worksheet(self) -> "gspread.Worksheet":
+        """The worksheet for the "rows" layout, created on first use."""
+        from gspread.exceptions import WorksheetNotFound
 
-        except Exception as e:
-            print(f"Error saving to Google Sheets: {e}")
-            return False
+        name = settings.SHEETS_RESPONSES_WORKSHEET
+        try:
+            return self.spreadsheet.worksheet(name)
+        except WorksheetNotFound:
+            return self.spreadsheet.add_worksheet(title=name, rows=1000, cols=26)
+
+    def _sync_response_header(self, question_ids: list[str]) -> list[str]:
+        """Return the header row, adding columns for question ids it doesn't have yet.
+
+        Only reads the header when it isn't cached or needs to grow (the
+        re-read picks up columns other workers added in the meantime).
+        """
+        header = self._response_header
+        if header is not None and all(question_id in header for question_id in question_ids):
+            return header
+
+        worksheet = self.responses_worksheet
+        header = worksheet.row_values(1) or list(self.ROW_HEADER)
+        missing = [question_id for question_id in question_ids if question_id not in header]
+        if missing or len(header) == len(self.ROW_HEADER):
+            header += missing
+            if len(header) > worksheet.col_count:
+                worksheet.add_cols(len(header) - worksheet.col_count)
+            worksheet.batch_update([{"range": "A1", "values": [header]}])
+        self._response_header = header
+        return header
+
+    def _append_rows(self, sessions: list[dict]) -> None:
+        """Append one row per session to the responses worksheet (called under the lock)."""
+        if self.responses_worksheet is None:
+            self.responses_worksheet = self._open_responses_worksheet()
+
+        # New question ids are added to the header in question order
+        question_ids = {}
+        for session in sessions:
+            question_ids.update(dict.fromkeys(session.get("question_ids") or ()))
+        header = self._sync_response_header(list(question_ids))
+        position = {question_id: col for col, question_id in enumerate(header)}
+        # Entries spooled before ids were recorded follow the header order
+        fallback_ids = header[len(self.ROW_HEADER):]
+
+        rows = []
+        for session in sessions:
+            completed_at = session.get("completed_at")
+            when = datetime.fromisoformat(completed_at) if completed_at else datetime.now()
+            row = [""] * len(header)
+            row[0] = when.strftime("%Y-%m-%d %H:%M:%S")
+            row[1] = session.get("session_id") or "unknown"
+
+            ids = session.get("question_ids") or fallback_ids
+            if len(ids) != len(session["responses"]):
+                # Positions can't be trusted; write what lines up and say what didn't
+                print(
+                    f"Warning: Session {row[1]} has {len(session['responses'])} response(s) "
+                    f"for {len(ids)} question id(s), the answers may be misplaced or incomplete"
+                )
+            for question_id, response in zip(ids, session["responses"]):
+                if isinstance(response, list):
+                    response = ", ".join(str(r) for r in response)
+                row[position[question_id]] = str(response)
+            rows.append(row)
+
+        if rows:
+            # Anchor the append at A1 so Sheets doesn't guess another table
+            self.responses_worksheet.append_rows(rows, value_input_option="RAW", table_range="A1")
 
     def is_connected(self) -> bool:
         return self.client is not None and self.worksheet is not None
+
+
+def get_storage(connect: bool = True) -> GoogleSheetsStorage | None:
+    """Return the process-wide storage client, connecting on first use.
+
+    With connect=False, returns the existing client (or None) without
+    touching the network.
+    """
+    global _shared_storage
+    with _shared_lock:
+        if _shared_storage is None and connect:
+            _shared_storage = GoogleSheetsStorage()
+        return _shared_storage
@@ -0,0 +1,274 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from config import settings
+from .base import LocalStorage, StorageBackend
+from .google_sheets import get_storage
+
+_shared_storage: StorageBackend | None = None
+_shared_lock = threading.Lock()
+
+
+class SQLiteResponseStorage(LocalStorage):
+    """Completed sessions in a local SQLite database in WAL mode.
+
+    Each `save_batch` is one transaction, so a batch costs a single commit
+    however many sessions it holds. Rows get increasing ids, and the
+    export cursor is the last exported id, kept in the same database.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stats = {"saved": 0, "errors": 0, "last_error": None}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT, data TEXT NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS export_cursor (name TEXT PRIMARY KEY, last_id INTEGER NOT NULL)"
+        )
+
+    def save_batch(self, sessions: list[dict]) -> bool:
+        rows = [(session.get("session_id"), json.dumps(session)) for session in sessions]
+        try:
+            with self._lock:
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    self._db.executemany("INSERT INTO responses (session_id, data) VALUES (?, ?)", rows)
+                    self._db.execute("COMMIT")
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            self.stats["errors"] += 1
+            self.stats["last_error"] = str(e)
+            print(f"Error saving responses to {self.path}: {e}")
+            return False
+        self.stats["saved"] += len(rows)
+        return True
+
+    def _exported_id(self) -> int:
+        row = self._db.execute("SELECT last_id FROM export_cursor WHERE name = 'sheets'").fetchone()
+        return row[0] if row else 0
+
+    def read_unexported(self, limit: int) -> tuple[list[dict], int]:
+        with self._lock:
+            last_id = self._exported_id()
+            rows = self._db.execute(
+                "SELECT id, data FROM responses WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit)
+            ).fetchall()
+        if rows:
+            last_id = rows[-1][0]
+        return [json.loads(data) for _, data in rows], last_id
+
+    def mark_exported(self, cursor: int) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO export_cursor VALUES ('sheets', ?)", (cursor,))
+
+    def pending_export(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM responses WHERE id > ?", (self._exported_id(),)
+            ).fetchone()[0]
+
+    def health(self) -> dict:
+        return {"backend": self.name, "pending_export": self.pending_export(), **self.stats}
+
+
+class JSONLResponseStorage(LocalStorage):
+    """Completed sessions in an append-only log of JSON lines.
+
+    The log is split into numbered segment files (`responses-000001.jsonl`,
+    ...), and a new segment starts once the current one reaches
+    `segment_bytes`. Each batch is appended with a single `write` on a file
+    opened in append mode and then fsynced, so workers on one host can share
+    the directory. The export cursor is a (segment, byte offset) pair kept
+    in `export-cursor.json`. Segments only grow, so `pending_export` keeps
+    line counts and only reads what was appended since it last looked.
+    """
+
+    name = "jsonl"
+
+    def __init__(self, directory: str | Path, segment_bytes: int = 64 * 1024 * 1024):
+        self.path = Path(directory)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.cursor_path = self.path / "export-cursor.json"
+        self.stats = {"saved": 0, "errors": 0, "last_error": None}
+        self._lock = threading.Lock()
+        # Segment number -> (bytes counted, complete lines in them), for pending_export
+        self._line_counts: dict[int, tuple[int, int]] = {}
+        # Lines before the export cursor in its segment: (segment, offset, lines)
+        self._cursor_lines = (0, 0, 0)
+        self._count_lock = threading.Lock()
+
+    def _segments(self) -> list[Path]:
+        return sorted(self.path.glob("responses-*.jsonl"))
+
+    @staticmethod
+    def _segment_number(segment: Path) -> int:
+        return int(segment.stem.rsplit("-", 1)[1])
+
+    def _segment_path(self, number: int) -> Path:
+        return self.path / f"responses-{number:06d}.jsonl"
+
+    def _current_segment(self) -> Path:
+        segments = self._segments()
+        if not segments:
+            return self._segment_path(1)
+        latest = segments[-1]
+        if latest.stat().st_size >= self.segment_bytes:
+            return self._segment_path(self._segment_number(latest) + 1)
+        return latest
+
+    def save_batch(self, sessions: list[dict]) -> bool:
+        data = "".join(json.dumps(session) + "\n" for session in sessions).encode("utf-8")
+        try:
+            with self._lock:
+                fd = os.open(self._current_segment(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, data)
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+        except OSError as e:
+            self.stats["errors"] += 1
+            self.stats["last_error"] = str(e)
+            print(f"Error saving responses to {self.path}: {e}")
+            return False
+        self.stats["saved"] += len(sessions)
+        return True
+
+    def _read_cursor(self) -> tuple[int, int]:
+        try:
+            with open(self.cursor_path, "r") as f:
+                cursor = json.load(f)
+            return cursor["segment"], cursor["offset"]
+        except FileNotFoundError:
+            return 0, 0
+
+    def read_unexported(self, limit: int) -> tuple[list[dict], tuple[int, int]]:
+        segment_number, offset = self._read_cursor()
+        sessions = []
+        for segment in self._segments():
+            number = self._segment_number(segment)
+            if number < segment_number:
+                continue
+            if number > segment_number:
+                segment_number, offset = number, 0
+
+            with open(segment, "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # A batch still being written; picked up next time
+                        return sessions, (segment_number, offset)
+                    offset += len(line)
+                    if line.strip():
+                        sessions.append(json.loads(line))
+                    if len(sessions) >= limit:
+                        return sessions, (segment_number, offset)
+        return sessions, (segment_number, offset)
+
+    def mark_exported(self, cursor: tuple[int, int]) -> None:
+        segment_number, offset = cursor
+        tmp_path = self.cursor_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"segment": segment_number, "offset": offset}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.cursor_path)
+
+        # Segments before the cursor are fully exported
+        for segment in self._segments():
+            if self._segment_number(segment) < segment_number:
+                segment.unlink(missing_ok=True)
+
+    @staticmethod
+    def _count_lines(segment: Path, start: int, end: int | None = None) -> tuple[int, int]:
+        """Complete lines from byte `start` up to `end` (or the end of the file).
+
+        Returns (offset just past the last complete line, number of lines).
+        """
+        counted = start
+        lines = 0
+        with open(segment, "rb") as f:
+            f.seek(start)
+            position = start
+            while end is None or position < end:
+                chunk = f.read(1024 * 1024 if end is None else min(1024 * 1024, end - position))
+                if not chunk:
+                    break
+                newlines = chunk.count(b"\n")
+                if newlines:
+                    lines += newlines
+                    counted = position + chunk.rfind(b"\n") + 1
+                position += len(chunk)
+        return counted, lines
+
+    def pending_export(self) -> int:
+        segment_number, offset = self._read_cursor()
+        pending = 0
+        with self._count_lock:
+            for segment in self._segments():
+                number = self._segment_number(segment)
+                if number < segment_number:
+                    continue
+                try:
+                    counted, lines = self._line_counts.get(number, (0, 0))
+                    counted, new_lines = self._count_lines(segment, counted)
+                    lines += new_lines
+                    self._line_counts[number] = (counted, lines)
+
+                    if number == segment_number:
+                        # The cursor only moves forward, so count on from where it was
+                        cursor_number, cursor_offset, before = self._cursor_lines
+                        if cursor_number != number or cursor_offset > offset:
+                            cursor_offset, before = 0, 0
+                        before += self._count_lines(segment, cursor_offset, offset)[1]
+                        self._cursor_lines = (number, offset, before)
+                        lines -= before
+                except FileNotFoundError:
+                    # Removed by an export in the meantime
+                    continue
+                pending += lines
+
+            # Forget exported segments
+            for number in [n for n in self._line_counts if n < segment_number]:
+                del self._line_counts[number]
+        return pending
+
+    def health(self) -> dict:
+        return {"backend": self.name, "pending_export": self.pending_export(), **self.stats}
+
+
+def get_response_storage() -> StorageBackend:
+    """Return the process-wide store for completed sessions (RESPONSE_STORAGE).
+
+    "sheets" saves straight to Google Sheets. "sqlite" and "jsonl" save
+    locally, and SheetsExporter copies new sessions to the sheet.
+    """
+    global _shared_storage
+    backend = settings.RESPONSE_STORAGE.lower()
+    if backend not in ("sqlite", "jsonl"):
+        return get_storage()
+
+    with _shared_lock:
+        if _shared_storage is None:
+            if backend == "sqlite":
+                _shared_storage = SQLiteResponseStorage(settings.RESPONSE_DB_FILE)
+            else:
+                _shared_storage = JSONLResponseStorage(
+                    settings.RESPONSE_LOG_DIR,
+                    segment_bytes=settings.RESPONSE_LOG_SEGMENT_BYTES
+                )
+        return _shared_storage
@@ -0,0 +1,232 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+from core.metrics import LOCAL_SAVES, SHEETS_SAVES, SHEETS_SAVE_FAILURES, STAGE_SECONDS
+
+# A spool .tmp file older than this was left by a crash mid-write, not one in progress
+STALE_TMP_SECONDS = 60
+
+
+class WriteBehindQueue:
+    """Durable write-behind queue for completed sessions.
+
+    Completed sessions are first written to a local spool directory (one JSON
+    file per session), so the request can return immediately and nothing is
+    lost if the storage backend is down. A background worker drains the
+    spool, merges several sessions into a single `save_batch` call and
+    retries with exponential backoff. Spooled sessions left over from a
+    previous run are replayed on start, along with complete entries a crash
+    left in their .tmp file; partial .tmp files are removed.
+
+    Several worker processes may share one spool directory: a worker
+    claims a file by renaming it (`<name>.json.<pid>`) before saving it, so
+    each session is saved once.
+    """
+
+    def __init__(
+        self,
+        storage_factory: Callable[[], Any],
+        spool_dir: str | Path,
+        batch_size: int = 20,
+        linger: float = 0.5,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 300.0,
+    ):
+        self.storage_factory = storage_factory
+        self.spool_dir = Path(spool_dir)
+        self.batch_size = batch_size
+        self.linger = linger
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._queue: asyncio.Queue[Path] | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """Create the spool directory, replay leftovers and start the worker."""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._queue = asyncio.Queue()
+        self._release_orphaned_claims()
+        self._clean_stale_tmp_files()
+
+        leftovers = sorted(self.spool_dir.glob("*.json"))
+        for path in leftovers:
+            self._queue.put_nowait(path)
+        if leftovers:
+            print(f"Replaying {len(leftovers)} spooled session(s)")
+
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Give the worker a chance to drain, then cancel it.
+
+        Anything not yet saved stays in the spool for the next start.
+        """
+        if not self._task:
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Warning: {self.pending} session(s) left in spool at shutdown")
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def enqueue(
+        self,
+        session_id: str,
+        questions: list[str],
+        responses: list[str],
+        question_ids: list[str] | None = None
+    ) -> None:
+        """Durably spool a completed session and hand it to the worker."""
+        entry = {
+            "session_id": session_id,
+            "questions": questions,
+            "question_ids": question_ids,
+            "responses": responses,
+            "completed_at": datetime.now().isoformat(),
+        }
+        path = await asyncio.to_thread(self._spool, entry)
+        self._queue.put_nowait(path)
+
+    @property
+    def pending(self) -> int:
+        """Number of spooled sessions not yet saved."""
+        return self._queue.qsize() if self._queue else 0
+
+    def _spool(self, entry: dict) -> Path:
+        """Write one entry to the spool atomically."""
+        name = f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{uuid.uuid4().hex[:8]}.json"
+        path = self.spool_dir / name
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return path
+
+    def _release_orphaned_claims(self) -> None:
+        """Return files claimed by processes that no longer exist to the spool."""
+        for claimed in self.spool_dir.glob("*.json.*"):
+            pid = claimed.suffix[1:]
+            if not pid.isdigit() or _process_alive(int(pid)):
+                continue
+            try:
+                os.rename(claimed, claimed.with_suffix(""))
+            except FileNotFoundError:
+                pass
+
+    def _clean_stale_tmp_files(self) -> None:
+        """Deal with .tmp files a crash left between writing and renaming them.
+
+        Complete entries are moved into the spool to be replayed; partial
+        ones are removed. Recent files may still be written by another
+        worker sharing the spool, so they are left alone.
+        """
+        cutoff = time.time() - STALE_TMP_SECONDS
+        for tmp_path in self.spool_dir.glob("*.tmp"):
+            try:
+                if tmp_path.stat().st_mtime > cutoff:
+                    continue
+                with open(tmp_path, "r") as f:
+                    json.load(f)
+            except FileNotFoundError:
+                continue
+            except (OSError, json.JSONDecodeError):
+                print(f"Warning: Removing incomplete spool file {tmp_path}")
+                tmp_path.unlink(missing_ok=True)
+                continue
+            os.replace(tmp_path, tmp_path.with_suffix(".json"))
+
+    async def _run(self) -> None:
+        batch: list[Path] = []
+        delay = self.retry_delay
+
+        while True:
+            if not batch:
+                batch.append(await self._queue.get())
+                # Let concurrent completions arrive so they share one update
+                await asyncio.sleep(self.linger)
+
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                saved = await asyncio.to_thread(self._flush, batch)
+            except Exception as e:
+                print(f"Warning: Could not save responses: {e}")
+                saved = False
+
+            if saved:
+                for _ in batch:
+                    self._queue.task_done()
+                batch = []
+                delay = self.retry_delay
+            else:
+                print(f"Retrying {len(batch)} spooled session(s) in {delay:g}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+
+    def _flush(self, paths: list[Path]) -> bool:
+        """Save a batch of spooled sessions and remove them from the spool."""
+        claimed = {}
+        entries = []
+        for path in paths:
+            claim = path.with_name(f"{path.name}.{os.getpid()}")
+            try:
+                os.rename(path, claim)
+            except FileNotFoundError:
+                # Already saved, or claimed by another worker
+                if not claim.exists():
+                    continue
+            try:
+                with open(claim, "r") as f:
+                    entries.append(json.load(f))
+                claimed[path] = claim
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Warning: Skipping unreadable spool file {path}: {e}")
+                claim.rename(path.with_suffix(".bad"))
+
+        saved = not entries
+        backend = "sheets"
+        try:
+            if entries:
+                storage = self.storage_factory()
+                backend = getattr(storage, "name", "sheets")
+                with STAGE_SECONDS.time(stage=f"{backend}_write"):
+                    saved = storage.save_batch(entries)
+        finally:
+            if entries and backend == "sheets":
+                if saved:
+                    SHEETS_SAVES.inc(len(entries))
+                else:
+                    SHEETS_SAVE_FAILURES.inc()
+            elif entries and saved:
+                LOCAL_SAVES.inc(len(entries), backend=backend)
+            for path, claim in claimed.items():
+                if saved:
+                    claim.unlink(missing_ok=True)
+                else:
+                    # Hand the file back so it is retried (here or after a restart)
+                    os.rename(claim, path)
+        return saved
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from core.session import SessionState
+from core.session_store import MemorySessionBackend, RedisSessionBackend, SQLiteSessionBackend
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class SessionBackendBehaviour:
+    """Checks shared by the session backends; `make_backend` builds one."""
+
+    def make_backend(self, max_sessions: int = 10000):
+        raise NotImplementedError
+
+    def make_session(self, session_id: str) -> SessionState:
+        return SessionState(session_id, questions_version="v1", size=3)
+
+    def test_add_and_get(self):
+        backend = self.make_backend()
+        backend.add(self.make_session("a"))
+
+        session = backend.get("a")
+        self.assertEqual(session.session_id, "a")
+        self.assertEqual(session.questions_version, "v1")
+        self.assertEqual(session.values, [None, None, None])
+        self.assertIsNone(backend.get("missing"))
+        self.assertEqual(len(backend), 1)
+
+    def test_save_persists_changes(self):
+        backend = self.make_backend()
+        backend.add(self.make_session("a"))
+
+        session = backend.get("a")
+        session.record(1, ["x", "y"])
+        session.skipped[2] = 1
+        session.current_question_index = 2
+        backend.save(session)
+
+        stored = backend.get("a")
+        self.assertEqual(stored.values, [None, ["x", "y"], None])
+        self.assertEqual(stored.response_count, 1)
+        self.assertEqual(list(stored.skipped), [0, 0, 1])
+        self.assertEqual(stored.current_question_index, 2)
+
+    def test_offload_keeps_completion(self):
+        backend = self.make_backend()
+        session = self.make_session("a")
+        session.record(0, "x")
+        session.completed = True
+        backend.add(session)
+
+        backend.offload(session)
+        self.assertIsNone(backend.get("a"))
+        self.assertEqual(len(backend), 0)
+        self.assertEqual(backend.evicted["offloaded"], 1)
+        self.assertEqual(backend.get_completed("a"), (3, 1))
+        self.assertIsNone(backend.get_completed("missing"))
+
+    def test_async_variants(self):
+        backend = self.make_backend()
+
+        async def roundtrip():
+            await backend.aadd(self.make_session("a"))
+            session = await backend.aget("a")
+            session.record(0, "x")
+            await backend.asave(session)
+            stored = await backend.aget("a")
+            await backend.aoffload(stored)
+            return stored, await backend.aget("a"), await backend.aget_completed("a")
+
+        stored, offloaded, completed = asyncio.run(roundtrip())
+        self.assertEqual(stored.values, ["x", None, None])
+        self.assertIsNone(offloaded)
+        self.assertEqual(completed, (3, 1))
+
+    def test_question_sets(self):
+        backend = self.make_backend()
+        backend.save_question_set("v1", '[{"id": "q1"}]')
+        backend.save_question_set("v1", "ignored, versions are immutable")
+
+        self.assertEqual(backend.load_question_set("v1"), '[{"id": "q1"}]')
+        self.assertIsNone(backend.load_question_set("v2"))
+
+    def test_cap_evicts_least_recently_used(self):
+        backend = self.make_backend(max_sessions=2)
+        backend.add(self.make_session("a"))
+        backend.add(self.make_session("b"))
+        backend.get("a")  # b is now the least recently used
+        backend.add(self.make_session("c"))
+
+        self.assertIsNone(backend.get("b"))
+        self.assertIsNotNone(backend.get("a"))
+        self.assertIsNotNone(backend.get("c"))
+        self.assertEqual(len(backend), 2)
+        self.assertEqual(backend.evicted["lru"], 1)
+
+
+class MemorySessionBackendTest(SessionBackendBehaviour, unittest.TestCase):
+    def make_backend(self, max_sessions: int = 10000):
+        return MemorySessionBackend(max_sessions=max_sessions)
+
+    def test_question_sets(self):
+        # A single worker has every question set in memory already
+        backend = self.make_backend()
+        backend.save_question_set("v1", "[]")
+        self.assertIsNone(backend.load_question_set("v1"))
+
+
+class SQLiteSessionBackendTest(SessionBackendBehaviour, unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def make_backend(self, max_sessions: int = 10000):
+        path = os.path.join(self.tmp.name, "sessions.db")
+        backend = SQLiteSessionBackend(path, max_sessions=max_sessions, prune_every=1)
+        self.addCleanup(backend._db.close)
+        return backend
+
+    def test_old_format_counts_as_expired(self):
+        backend = self.make_backend()
+        backend.add(self.make_session("a"))
+        backend._db.execute(
+            "UPDATE sessions SET data = ? WHERE session_id = 'a'",
+            ('{"session_id": "a", "responses": [], "answers": {}}',)
+        )
+        self.assertIsNone(backend.get("a"))
+
+
+@unittest.skipUnless(fakeredis, "fakeredis is not installed")
+class RedisSessionBackendTest(SessionBackendBehaviour, unittest.TestCase):
+    def make_backend(self, max_sessions: int = 10000):
+        return RedisSessionBackend(max_sessions=max_sessions, client=fakeredis.FakeRedis())
+
+    def test_sessions_expire_with_the_ttl(self):
+        backend = self.make_backend()
+        backend.add(self.make_session("a"))
+        ttl = backend.redis.ttl(backend._key("a"))
+        self.assertTrue(0 < ttl <= backend.ttl_seconds)
+
+    def test_expired_session_leaves_the_index(self):
+        backend = self.make_backend()
+        backend.add(self.make_session("a"))
+        backend.redis.delete(backend._key("a"))
+
+        self.assertIsNone(backend.get("a"))
+        self.assertEqual(len(backend), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()